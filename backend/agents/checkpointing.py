@@ -0,0 +1,221 @@
+# backend/agents/checkpointing.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "1") == "1"
+CHECKPOINT_DB = os.path.join(CACHE_DIR, "checkpoints.sqlite")
+CHECKPOINT_BLOB_DIR = os.path.join(CACHE_DIR, "checkpoint_blobs")
+# Strings at least this long (file contents, logs, proposed fixes) are stored once as blobs, not in every checkpoint.
+CHECKPOINT_BLOB_MIN_BYTES = int(os.getenv("CHECKPOINT_BLOB_MIN_BYTES", "1024"))
+CHECKPOINT_BLOB_TTL_SECONDS = int(os.getenv("CHECKPOINT_BLOB_TTL_SECONDS", str(7 * 24 * 3600)))
+# A run that keeps crashing the process is not resumed forever.
+CHECKPOINT_MAX_RESUMES = int(os.getenv("CHECKPOINT_MAX_RESUMES", "2"))
+
+BLOB_MARKER = "__blob__"
+BLOB_TYPE_PREFIX = "blobs+"
+
+
+class BlobSerializer:
+    """
+    LangGraph serializer that moves large strings out of checkpoints into content-addressed,
+    zlib-compressed files. A file that did not change between nodes is written once, and every
+    checkpoint that contains it only stores its 64-character digest.
+    """
+
+    def __init__(self, blob_dir: str = CHECKPOINT_BLOB_DIR, min_bytes: int = CHECKPOINT_BLOB_MIN_BYTES):
+        self.blob_dir = blob_dir
+        self.min_bytes = min_bytes
+        self._inner = None
+        self.stats = {"blobs_written": 0, "blobs_reused": 0, "bytes_offloaded": 0}
+
+    @property
+    def inner(self):
+        # LangGraph's serializer is only needed once checkpoints are written, not when the module is imported
+        if self._inner is None:
+            from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+            self._inner = JsonPlusSerializer()
+        return self._inner
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _put(self, text: str) -> str:
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            os.utime(path)  # keeps the blob clear of the TTL sweep while checkpoints still use it
+            self.stats["blobs_reused"] += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp_path, path)
+            self.stats["blobs_written"] += 1
+        self.stats["bytes_offloaded"] += len(data)
+        return digest
+
+    def _get(self, digest: str) -> str:
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def _offload(self, obj):
+        """Returns (obj with large strings swapped for blob markers, whether anything was swapped)."""
+        if isinstance(obj, str):
+            if len(obj) >= self.min_bytes:
+                return {BLOB_MARKER: self._put(obj)}, True
+            return obj, False
+        if isinstance(obj, dict):
+            items = [(key, *self._offload(value)) for key, value in obj.items()]
+            if any(swapped for _, _, swapped in items):
+                return {key: value for key, value, _ in items}, True
+            return obj, False
+        if isinstance(obj, (list, tuple)):
+            items = [self._offload(value) for value in obj]
+            if any(swapped for _, swapped in items):
+                return type(obj)(value for value, _ in items), True
+            return obj, False
+        return obj, False
+
+    def _restore(self, obj):
+        if isinstance(obj, dict):
+            if len(obj) == 1 and BLOB_MARKER in obj:
+                return self._get(obj[BLOB_MARKER])
+            return {key: self._restore(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._restore(value) for value in obj)
+        return obj
+
+    def dumps_typed(self, obj):
+        offloaded, swapped = self._offload(obj)
+        type_, data = self.inner.dumps_typed(offloaded)
+        return (BLOB_TYPE_PREFIX + type_ if swapped else type_), data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith(BLOB_TYPE_PREFIX):
+            return self._restore(self.inner.loads_typed((type_[len(BLOB_TYPE_PREFIX):], payload)))
+        return self.inner.loads_typed(data)
+
+    def sweep(self, max_age: int = CHECKPOINT_BLOB_TTL_SECONDS) -> int:
+        """Deletes blobs no checkpoint has written or reused for `max_age` seconds."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+blob_serializer = BlobSerializer()
+
+
+@asynccontextmanager
+async def open_checkpointer(path: str = CHECKPOINT_DB):
+    """The SQLite checkpointer for the app's lifetime, or None when CHECKPOINTS_ENABLED=0."""
+    if not CHECKPOINTS_ENABLED:
+        yield None
+        return
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    removed = blob_serializer.sweep()
+    if removed:
+        print(f"🧹 CHECKPOINTS: Removed {removed} stale blob(s)")
+    async with aiosqlite.connect(path) as conn:
+        saver = AsyncSqliteSaver(conn, serde=blob_serializer)
+        await saver.setup()
+        yield saver
+
+
+class RunJournal:
+    """
+    Which runs were accepted and have not finished, with the request needed to restart them.
+    Lives next to the checkpoints so a new process knows which graph threads to resume.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    request TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    submitted REAL NOT NULL,
+                    resumes INTEGER NOT NULL DEFAULT 0,
+                    status TEXT
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def start(self, run_id: str, request: dict, priority: int = 0):
+        if not CHECKPOINTS_ENABLED:
+            return
+        with self._lock:
+            self._db().execute(
+                "INSERT OR IGNORE INTO runs (run_id, request, priority, submitted) VALUES (?, ?, ?, ?)",
+                (run_id, json.dumps(request), priority, time.time())
+            )
+            self._db().commit()
+
+    def unclaim(self, run_id: str):
+        """Takes back the attempt claim_unfinished() counted, for a run that could not be re-queued after all."""
+        if not CHECKPOINTS_ENABLED:
+            return
+        with self._lock:
+            self._db().execute("UPDATE runs SET resumes = MAX(resumes - 1, 0) WHERE run_id = ?", (run_id,))
+            self._db().commit()
+
+    def finish(self, run_id: str, status: str):
+        if not CHECKPOINTS_ENABLED:
+            return
+        with self._lock:
+            self._db().execute("UPDATE runs SET status = ? WHERE run_id = ?", (status, run_id))
+            self._db().commit()
+
+    def claim_unfinished(self) -> list:
+        """Unfinished runs to restart, oldest first, as (run_id, request, priority). Counts the attempt."""
+        if not CHECKPOINTS_ENABLED:
+            return []
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM runs WHERE status IS NOT NULL AND submitted < ?", (time.time() - CHECKPOINT_BLOB_TTL_SECONDS,))
+            rows = db.execute(
+                "SELECT run_id, request, priority, resumes FROM runs WHERE status IS NULL ORDER BY submitted"
+            ).fetchall()
+            claimed = []
+            for run_id, request, priority, resumes in rows:
+                if resumes >= CHECKPOINT_MAX_RESUMES:
+                    print(f"⚠️ CHECKPOINTS: Run {run_id} was already resumed {resumes} time(s). Giving up on it.")
+                    db.execute("UPDATE runs SET status = 'ABANDONED' WHERE run_id = ?", (run_id,))
+                    continue
+                db.execute("UPDATE runs SET resumes = resumes + 1 WHERE run_id = ?", (run_id,))
+                claimed.append((run_id, json.loads(request), priority))
+            db.commit()
+            return claimed
+
+
+run_journal = RunJournal()
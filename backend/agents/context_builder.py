@@ -0,0 +1,107 @@
+# backend/agents/context_builder.py
+import ast
+import textwrap
+from dataclasses import dataclass
+
+# Helpers longer than this are shown to the model by signature only.
+MAX_HELPER_LINES = 30
+
+
+@dataclass
+class RepairContext:
+    """The slice of a file the Minister of Repair actually needs to see."""
+    start: int          # 1-based, inclusive (includes decorators)
+    end: int            # 1-based, inclusive
+    span: str           # enclosing function/class source, which the model rewrites
+    imports: str        # module-level imports (read-only context)
+    helpers: str        # module-level symbols the span refers to (read-only context)
+
+
+def _span_start(node) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _enclosing_definition(tree: ast.Module, line: int):
+    """Innermost def/class whose body covers `line`."""
+    best = None
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if _span_start(node) <= line <= node.end_lineno:
+                if best is None or _span_start(node) >= _span_start(best):
+                    best = node
+    return best
+
+
+def _referenced_names(node) -> set:
+    names = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.add(child.id)
+        elif isinstance(child, ast.Attribute):
+            root = child
+            while isinstance(root, ast.Attribute):
+                root = root.value
+            if isinstance(root, ast.Name):
+                names.add(root.id)
+    return names
+
+
+def _top_level_symbols(tree: ast.Module) -> dict:
+    symbols = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            symbols[node.name] = node
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    symbols[target.id] = node
+    return symbols
+
+
+def build_repair_context(source: str, target_line: int):
+    """
+    Returns the enclosing function/class around `target_line` plus the imports and helpers it uses,
+    or None when the whole file has to be sent (unparseable file, unknown line, module-level code).
+    """
+    if target_line <= 0:
+        return None
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+
+    definition = _enclosing_definition(tree, target_line)
+    if definition is None:
+        return None
+
+    lines = source.splitlines()
+    start, end = _span_start(definition), definition.end_lineno
+    span = "\n".join(lines[start - 1:end])
+
+    imports = "\n".join(
+        ast.get_source_segment(source, node)
+        for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+    helpers = []
+    used = _referenced_names(definition)
+    for name, node in _top_level_symbols(tree).items():
+        if name not in used or _span_start(node) <= target_line <= node.end_lineno:
+            continue
+        segment = "\n".join(lines[_span_start(node) - 1:node.end_lineno])
+        if node.end_lineno - _span_start(node) + 1 > MAX_HELPER_LINES:
+            segment = lines[node.lineno - 1] + "\n    ..."
+        helpers.append(segment)
+
+    return RepairContext(start, end, span, imports, "\n\n".join(helpers))
+
+
+def splice_span(source: str, context: RepairContext, new_span: str) -> str:
+    """Replaces lines start..end with `new_span`, re-indented to the original span's indentation."""
+    lines = source.splitlines()
+    original_first = lines[context.start - 1]
+    indent = original_first[:len(original_first) - len(original_first.lstrip())]
+    new_lines = textwrap.indent(textwrap.dedent(new_span.strip("\n")), indent).splitlines()
+    result = "\n".join(lines[:context.start - 1] + new_lines + lines[context.end:])
+    return result + "\n" if source.endswith("\n") else result
@@ -0,0 +1,224 @@
+# backend/agents/fix_memory.py
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+import metrics
+from .context_builder import build_repair_context
+from .patching import Edit, PatchError, apply_patch
+from .traceback_analyzer import error_signature
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+FIX_MEMORY_ENABLED = os.getenv("FIX_MEMORY_ENABLED", "1") == "1"
+FIX_MEMORY_DB = os.path.join(CACHE_DIR, "fix_memory.sqlite")
+# Token overlap (Jaccard) a different signature needs before its fix is tried. 1.0 = exact matches only.
+FIX_MEMORY_MIN_SIMILARITY = float(os.getenv("FIX_MEMORY_MIN_SIMILARITY", "0.75"))
+# A remembered fix that keeps failing when reused stops being offered.
+FIX_MEMORY_MIN_SUCCESS_RATE = float(os.getenv("FIX_MEMORY_MIN_SUCCESS_RATE", "0.5"))
+FIX_MEMORY_TTL_SECONDS = int(os.getenv("FIX_MEMORY_TTL_SECONDS", str(90 * 24 * 3600)))
+# Unchanged lines kept around each stored edit, so it can be found again in a file that moved around.
+FIX_MEMORY_CONTEXT_LINES = 2
+# Near-miss candidates scored per lookup (most recently used first).
+FIX_MEMORY_MAX_CANDIDATES = 200
+
+TOKEN_RE = re.compile(r'<\w+>|[A-Za-z_][\w.]*|\S')
+
+
+def code_hash(source: str, line: int) -> str:
+    """Hash of the code around the bug: its enclosing function/class, or the whole file when there is none."""
+    context = build_repair_context(source, line)
+    code = context.span if context else source
+    normalized = "\n".join(line.rstrip() for line in code.splitlines()).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def signature_key(signature) -> str:
+    raw = json.dumps([signature.exception, signature.message, list(signature.frames)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def signature_tokens(signature) -> set:
+    return set(TOKEN_RE.findall(f"{signature.exception} {signature.message}")) | {f"@{name}" for name in signature.frames}
+
+
+def diff_edits(before: str, after: str) -> list:
+    """The change from `before` to `after` as search/replace pairs, with a little context so each one can be located."""
+    old, new = before.splitlines(), after.splitlines()
+    edits = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for group in matcher.get_grouped_opcodes(FIX_MEMORY_CONTEXT_LINES):
+        i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+        edits.append([old[i1:i2], new[j1:j2]])
+    return edits
+
+
+@dataclass
+class RecalledFix:
+    entry_id: int
+    file: str
+    line: int
+    code: str           # the file with the remembered edits applied
+    commit_msg: str
+    match: str          # "exact" or "near"
+    similarity: float
+
+
+class FixMemory:
+    """
+    Fixes that passed the sandbox, keyed by the error signature they fixed and a hash of the code around it.
+    The same bug in the same code (another run, another fork) gets the stored edits back without an LLM call.
+    """
+
+    def __init__(self, path: str = FIX_MEMORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0,
+                         "reused_passed": 0, "reused_failed": 0, "stored": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fixes (
+                    id INTEGER PRIMARY KEY,
+                    signature TEXT NOT NULL,
+                    code_hash TEXT NOT NULL,
+                    exception TEXT NOT NULL,
+                    tokens TEXT NOT NULL,
+                    edits TEXT NOT NULL,
+                    commit_msg TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    tries INTEGER NOT NULL DEFAULT 0,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (signature, code_hash, edits)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS fixes_by_exception ON fixes (exception, last_used)")
+            self._conn.execute("DELETE FROM fixes WHERE last_used < ?", (time.time() - FIX_MEMORY_TTL_SECONDS,))
+            self._conn.commit()
+        return self._conn
+
+    def remember(self, error_logs: str, repo_path: str, target_file: str, original: str, fixed: str, commit_msg: str):
+        """Stores a fix that just passed the sandbox against the failure it fixed in `target_file`."""
+        if not FIX_MEMORY_ENABLED or not original or original == fixed:
+            return
+        signature = error_signature(error_logs, repo_path, target_file)
+        if signature is None:
+            return
+        edits = diff_edits(original, fixed)
+        if not edits or any(not search for search, _ in edits):
+            return  # an insertion with no context (empty file) cannot be located again
+        with self._lock:
+            now = time.time()
+            cursor = self._db().execute(
+                "INSERT OR IGNORE INTO fixes (signature, code_hash, exception, tokens, edits, commit_msg, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (signature_key(signature), code_hash(original, signature.line), signature.exception,
+                 " ".join(sorted(signature_tokens(signature))), json.dumps(edits), commit_msg, now, now)
+            )
+            self._db().commit()
+            if cursor.rowcount:
+                self.counters["stored"] += 1
+                print(f"🧠 FIX MEMORY: Remembered the fix for {signature.exception} in {target_file}")
+
+    def _usable(self, tries: int, successes: int) -> bool:
+        # The run that stored the fix counts as its first success
+        return successes + 1 >= (tries + 1) * FIX_MEMORY_MIN_SUCCESS_RATE
+
+    def _apply(self, source: str, edits_json: str):
+        try:
+            return apply_patch(source, [Edit(search, replace) for search, replace in json.loads(edits_json)])
+        except PatchError:
+            return None
+
+    def recall(self, error_logs: str, repo_path: str, target_file: str = None):
+        """A remembered fix for the log's main failure (or its failure in `target_file`) that applies to the current file, or None."""
+        if not FIX_MEMORY_ENABLED:
+            return None
+        with self._lock:
+            self.counters["lookups"] += 1
+        signature = error_signature(error_logs, repo_path, target_file)
+        if signature is None or signature.file == "unknown":
+            return self._miss()
+        path = os.path.join(repo_path, signature.file)
+        if not os.path.isfile(path):
+            return self._miss()
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            source = f.read()
+
+        key, current_hash = signature_key(signature), code_hash(source, signature.line)
+        tokens = signature_tokens(signature)
+        with self._lock:
+            db = self._db()
+            # 1. Exact: same failure in the same code, most reliable fix first
+            rows = db.execute(
+                "SELECT id, edits, commit_msg, tries, successes FROM fixes WHERE signature = ? AND code_hash = ?"
+                " ORDER BY successes - tries DESC, last_used DESC", (key, current_hash)
+            ).fetchall()
+            candidates = [(row, "exact", 1.0) for row in rows]
+            # 2. Near miss: same exception with a similar message and call path; the edits still have to apply
+            if FIX_MEMORY_MIN_SIMILARITY < 1.0:
+                near = []
+                for entry_id, row_tokens, edits, commit_msg, tries, successes in db.execute(
+                    "SELECT id, tokens, edits, commit_msg, tries, successes FROM fixes"
+                    " WHERE exception = ? AND NOT (signature = ? AND code_hash = ?) ORDER BY last_used DESC LIMIT ?",
+                    (signature.exception, key, current_hash, FIX_MEMORY_MAX_CANDIDATES)
+                ):
+                    other = set(row_tokens.split())
+                    similarity = len(tokens & other) / len(tokens | other) if tokens | other else 0.0
+                    if similarity >= FIX_MEMORY_MIN_SIMILARITY:
+                        near.append(((entry_id, edits, commit_msg, tries, successes), "near", similarity))
+                candidates += sorted(near, key=lambda candidate: -candidate[2])
+
+        for (entry_id, edits, commit_msg, tries, successes), match, similarity in candidates:
+            if not self._usable(tries, successes):
+                continue
+            code = self._apply(source, edits)
+            if code is None:
+                continue
+            with self._lock:
+                self.counters[f"{match}_hits"] += 1
+            metrics.FIX_MEMORY_LOOKUPS.labels(match).inc()
+            return RecalledFix(entry_id, signature.file, signature.line, code, commit_msg, match, round(similarity, 3))
+        return self._miss()
+
+    def _miss(self):
+        with self._lock:
+            self.counters["misses"] += 1
+        metrics.FIX_MEMORY_LOOKUPS.labels("miss").inc()
+        return None
+
+    def record_outcome(self, entry_id: int, passed: bool):
+        """Whether a recalled fix passed the sandbox this time (feeds its success rate)."""
+        with self._lock:
+            self.counters["reused_passed" if passed else "reused_failed"] += 1
+            self._db().execute(
+                "UPDATE fixes SET tries = tries + 1, successes = successes + ?, last_used = ? WHERE id = ?",
+                (1 if passed else 0, time.time(), entry_id)
+            )
+            self._db().commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counters)
+            hits = counts["exact_hits"] + counts["near_hits"]
+            reused = counts["reused_passed"] + counts["reused_failed"]
+            entries = self._db().execute("SELECT COUNT(*) FROM fixes").fetchone()[0] if FIX_MEMORY_ENABLED else 0
+        return {
+            "enabled": FIX_MEMORY_ENABLED,
+            "entries": entries,
+            **counts,
+            "hit_rate": round(hits / counts["lookups"], 3) if counts["lookups"] else 0.0,
+            "success_rate": round(counts["reused_passed"] / reused, 3) if reused else 0.0,
+        }
+
+
+fix_memory = FixMemory()
@@ -0,0 +1,161 @@
+# backend/agents/github_client.py
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_GIT_URL = os.getenv("GITHUB_GIT_URL", "https://github.com").rstrip("/")   # where forks are pushed
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", "15"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "5"))
+GITHUB_MAX_BACKOFF = float(os.getenv("GITHUB_MAX_BACKOFF", "60"))
+FORK_READY_TIMEOUT = float(os.getenv("FORK_READY_TIMEOUT", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ForkNotReadyError(Exception):
+    """GitHub accepted the fork request but the fork never became usable within FORK_READY_TIMEOUT."""
+
+
+def _retry_after_seconds(value: str):
+    """A Retry-After header in seconds: either delay-seconds or an HTTP date. None if it is neither."""
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class GitHubClient:
+    """
+    One keep-alive session per token. Retries transient failures with exponential backoff,
+    waits out rate limits using GitHub's own headers, and caches lookups that never change mid-run.
+    """
+
+    def __init__(self, token: str, api_url: str = GITHUB_API_URL, git_url: str = GITHUB_GIT_URL):
+        self.token = token
+        self.api_url = api_url
+        self.git_url = git_url
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json",
+            "X-GitHub-Api-Version": "2022-11-28"
+        })
+        self._login = None
+        self._default_branches = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "fork_polls": 0}
+
+    def _retry_delay(self, response, attempt: int):
+        """Seconds to wait before retrying, or None if the response is not worth retrying."""
+        if response is not None:
+            rate_limited = response.status_code in (403, 429) and (
+                "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0"
+            )
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                retry_after = _retry_after_seconds(response.headers.get("Retry-After", ""))
+                if retry_after is not None:
+                    return min(retry_after, GITHUB_MAX_BACKOFF)
+                try:
+                    reset = float(response.headers["X-RateLimit-Reset"])
+                    return min(max(reset - time.time(), 0) + 1, GITHUB_MAX_BACKOFF)
+                except (KeyError, ValueError):
+                    pass  # no usable header: the default backoff below
+            if response.status_code not in RETRY_STATUSES:
+                return None
+        return min(0.5 * 2 ** attempt + random.uniform(0, 0.25), GITHUB_MAX_BACKOFF)
+
+    def request(self, method: str, path: str, accept: tuple = (), **kwargs) -> requests.Response:
+        """
+        Sends one API call, retrying connection errors, 5xx and rate limits.
+        Raises for any final 4xx/5xx, except the statuses listed in `accept`.
+        """
+        kwargs.setdefault("timeout", GITHUB_TIMEOUT)
+        url = path if path.startswith("http") else f"{self.api_url}{path}"
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            self.stats["requests"] += 1
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == GITHUB_MAX_RETRIES:
+                    raise
+            if response is not None and response.status_code in accept:
+                return response
+            delay = self._retry_delay(response, attempt) if attempt < GITHUB_MAX_RETRIES else None
+            if delay is None:
+                response.raise_for_status()
+                return response
+            self.stats["retries"] += 1
+            print(f"⏳ GITHUB: {method} {path} -> {response.status_code if response is not None else 'no response'}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def login(self) -> str:
+        """The token's username, fetched once per process."""
+        with self._lock:
+            if self._login is None:
+                self._login = self.request("GET", "/user").json()["login"]
+            return self._login
+
+    def default_branch(self, owner: str, repo: str) -> str:
+        key = f"{owner}/{repo}".lower()
+        with self._lock:
+            if key not in self._default_branches:
+                info = self.request("GET", f"/repos/{owner}/{repo}").json()
+                self._default_branches[key] = info.get("default_branch", "main")
+            return self._default_branches[key]
+
+    def fork(self, owner: str, repo: str):
+        """Requests a fork (a no-op if it already exists). Returns (fork_owner, fork_name)."""
+        info = self.request("POST", f"/repos/{owner}/{repo}/forks").json()
+        return info.get("owner", {}).get("login") or self.login(), info.get("name", repo)
+
+    def wait_for_fork(self, owner: str, repo: str, timeout: float = FORK_READY_TIMEOUT):
+        """Polls until the fork has git data (GitHub answers 404/409 while it is still being provisioned)."""
+        deadline = time.monotonic() + timeout
+        delay = 0.25
+        while True:
+            self.stats["fork_polls"] += 1
+            response = self.session.get(f"{self.api_url}/repos/{owner}/{repo}/commits", params={"per_page": 1}, timeout=GITHUB_TIMEOUT)
+            if response.status_code == 200:
+                return
+            # Rate limits and 5xx are waited out like any other call; anything else is a real error
+            wait = delay if response.status_code in (404, 409) else self._retry_delay(response, 0)
+            if wait is None or time.monotonic() + wait > deadline:
+                raise ForkNotReadyError(f"{owner}/{repo} not ready (HTTP {response.status_code})")
+            time.sleep(wait)
+            delay = min(delay * 2, 4)
+
+    def create_pull_request(self, owner: str, repo: str, payload: dict) -> requests.Response:
+        """Opens a PR. A 422 (PR already exists / nothing to compare) is returned, not raised."""
+        return self.request("POST", f"/repos/{owner}/{repo}/pulls", accept=(422,), json=payload)
+
+    def push_url(self, owner: str, repo: str) -> str:
+        """Authenticated git URL of a repo (tokens only go into https URLs)."""
+        url = f"{self.git_url}/{owner}/{repo}.git"
+        if url.startswith("https://"):
+            return url.replace("https://", f"https://x-access-token:{self.token}@", 1)
+        return url
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_github_client(token: str) -> GitHubClient:
+    """One client (and connection pool) per token, shared across runs."""
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = GitHubClient(token)
+        return _clients[token]
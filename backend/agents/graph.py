@@ -1,102 +1,178 @@
-from langgraph.graph import StateGraph, START, END
-from .graph_state import AgentState
-from .ministers import (
-    minister_of_classification, 
-    minister_of_localization, 
-    minister_of_repair, 
-    minister_of_validation,
-    minister_of_qa,       # 🧪 Added QA Minister
-    execution_sandbox
-)
-from .git_ops import github_push_node # 🛠️ Added Git Operations
-
-# --- 🚦 ROUTING LOGIC (The Brain's Decisions) ---
-
-def check_validation_status(state: AgentState):
-    """Routes based on formatting and commit message rules."""
-    print("--- ROUTER: Checking Validation Status ---")
-    if state.get("run_status") == "FORMATTING_FAILED":
-        attempts = state.get("format_attempts", 0)
-        if attempts < 3:
-            print(f"--- ROUTER: Format invalid. Retrying Repair (Attempt {attempts + 1}/3) ---")
-            return "retry_format"
-        return "end"
-            
-    print("--- ROUTER: Format is perfect. Proceeding to Sandbox. ---")
-    return "execute"
-
-def check_sandbox_status(state: AgentState):
-    """Decides if we fix, generate tests, or push to GitHub."""
-    run_status = state.get("run_status")
-    
-    # 1. SUCCESS: Tests passed! Time to ship it to GitHub.
-    if run_status == "TESTS_PASSED":
-        print("--- ROUTER: Tests Passed. Sending to Git Operations. ---")
-        return "push"
-    
-    # 2. NO TESTS FOUND: If it's a new repo, hire the Minister of QA!
-    error_log = state.get("error_message", "")
-    if ("No tests found" in error_log or "collected 0 items" in error_log) and not state.get("test_generated"):
-        print("--- ROUTER: No tests detected. Triggering Minister of QA. ---")
-        return "generate_tests"
-
-    # 3. FAILURE: Tests failed, try to fix it again (up to 3 times)
-    attempts = state.get("retry_count", 0)
-    if attempts < 3:
-        print(f"--- ROUTER: Logic Error detected. Looping back to Classifier (Attempt {attempts + 1}/3) ---")
-        return "retry_logic"
-    
-    print("--- ROUTER: Max retries reached. Stopping. ---")
-    return "end"
-
-# --- 🏗️ BUILD THE GRAPH ---
-
-print("Initializing The Healing Agent Neural Network...")
-builder = StateGraph(AgentState)
-
-# Define the Cabinet Nodes
-builder.add_node("Classifier", minister_of_classification)
-builder.add_node("Localizer", minister_of_localization)
-builder.add_node("Repair", minister_of_repair)
-builder.add_node("Validator", minister_of_validation)
-builder.add_node("Sandbox", execution_sandbox)
-builder.add_node("QA", minister_of_qa)          # 🧪 New Node
-builder.add_node("GitOps", github_push_node)    # 🛠️ Final Node
-
-# 1. The Startup Sequence
-builder.add_edge(START, "Classifier")
-builder.add_edge("Classifier", "Localizer")
-builder.add_edge("Localizer", "Repair")
-builder.add_edge("Repair", "Validator")
-
-# 2. The Validation Loop
-builder.add_conditional_edges(
-    "Validator",
-    check_validation_status,
-    {
-        "retry_format": "Repair", 
-        "execute": "Sandbox", 
-        "end": END
-    }
-)
-
-# 3. The Autonomous Environment Loop (The Heart of the Agent)
-builder.add_conditional_edges(
-    "Sandbox",
-    check_sandbox_status,
-    {
-        "generate_tests": "QA",      # 🧪 Create tests if none exist
-        "retry_logic": "Classifier", # 🔄 Try to fix the code again
-        "push": "GitOps",            # 🚀 Ship it to GitHub!
-        "end": END
-    }
-)
-
-# 4. Closing the QA Loop
-# Once tests are generated, we go back to the start to find the bugs those tests reveal!
-builder.add_edge("QA", "Classifier")
-
-# 5. Ending the Run
-builder.add_edge("GitOps", END)
-
-healing_agent = builder.compile()
\ No newline at end of file
+from functools import lru_cache
+from .graph_state import AgentState
+from metrics import timed_node # ⏱️ Per-node spans
+
+# --- 🚦 ROUTING LOGIC (The Brain's Decisions) ---
+
+def check_memory_status(state: AgentState):
+    """A remembered fix that passed goes straight to GitOps; anything else is diagnosed from scratch."""
+    if state.get("run_status") == "TESTS_PASSED":
+        print("--- ROUTER: Remembered fix passed. Sending to Git Operations. ---")
+        return "push"
+    return "diagnose"
+
+def choose_repair_mode(state: AgentState):
+    """One fix at a time, or race several candidates when SPECULATIVE_WIDTH > 1."""
+    from .speculative import speculative_width
+    if len(state.get("failure_sites") or []) > 1:
+        print("--- ROUTER: Failures span several files. Repairing them as one batch. ---")
+        return "single"
+    if speculative_width() > 1:
+        print("--- ROUTER: Speculative mode. Racing candidate fixes. ---")
+        return "speculative"
+    return "single"
+
+def check_validation_status(state: AgentState):
+    """Routes based on formatting and commit message rules."""
+    print("--- ROUTER: Checking Validation Status ---")
+    run_status = state.get("run_status")
+    if run_status in ("FORMATTING_FAILED", "STATIC_CHECK_FAILED"):
+        # Separate counters: static-check rejections must not use up the formatting retries, nor the other way round
+        attempts = state.get("format_attempts" if run_status == "FORMATTING_FAILED" else "static_check_attempts", 0)
+        if attempts < 3:
+            print(f"--- ROUTER: Fix rejected ({run_status}). Retrying Repair (Attempt {attempts + 1}/3) ---")
+            return "retry_format"
+        if run_status == "STATIC_CHECK_FAILED":
+            # Out of retries: let the sandbox have the final word (the static checks can be wrong about imports)
+            print("--- ROUTER: Static checks still failing. Proceeding to Sandbox anyway. ---")
+            return "execute"
+        return "end"
+            
+    print("--- ROUTER: Format is perfect. Proceeding to Sandbox. ---")
+    return "execute"
+
+def check_sandbox_status(state: AgentState):
+    """Decides if we fix, generate tests, or push to GitHub."""
+    run_status = state.get("run_status")
+    
+    # 1. SUCCESS: Tests passed! Time to ship it to GitHub.
+    if run_status == "TESTS_PASSED":
+        print("--- ROUTER: Tests Passed. Sending to Git Operations. ---")
+        return "push"
+    
+    # 2. NO TESTS FOUND: If it's a new repo, hire the Minister of QA!
+    report = state.get("test_report")
+    if report:
+        no_tests = not report["selected"] and report["collected"] == 0 and report["collection_errors"] == 0
+    else:
+        # No report (plain `node test.js`, timeouts): all we have is the log
+        error_log = state.get("error_message", "")
+        no_tests = "No tests found" in error_log or "collected 0 items" in error_log
+    if no_tests and not state.get("test_generated"):
+        print("--- ROUTER: No tests detected. Triggering Minister of QA. ---")
+        return "generate_tests"
+
+    # 3. FAILURE: Tests failed, try to fix it again (up to 3 times)
+    attempts = state.get("retry_count", 0)
+    if attempts < 3:
+        print(f"--- ROUTER: Logic Error detected. Looping back to Fix Memory / Classifier (Attempt {attempts + 1}/3) ---")
+        return "retry_logic"
+    
+    print("--- ROUTER: Max retries reached. Stopping. ---")
+    return "end"
+
+# --- 🏗️ BUILD THE GRAPH ---
+# LangGraph and the Ministers (and through them the LLM client) load when the graph is first built,
+# not when this module is imported: see get_healing_agent() and the warm-up in main.py's lifespan.
+
+@lru_cache(maxsize=1)
+def _graph_builder():
+    from langgraph.graph import StateGraph, START, END
+    from .ministers import (
+        minister_of_classification, 
+        minister_of_localization, 
+        minister_of_repair, 
+        minister_of_validation,
+        minister_of_qa,       # 🧪 Added QA Minister
+        execution_sandbox,
+        reuse_remembered_fix  # 🧠 Fixes that already passed for the same error
+    )
+    from .git_ops import github_push_node # 🛠️ Added Git Operations
+    from .speculative import speculative_repair # 🏁 Parallel candidate fixes
+
+    print("Initializing The Healing Agent Neural Network...")
+    builder = StateGraph(AgentState)
+
+    # Define the Cabinet Nodes
+    builder.add_node("FixMemory", timed_node("FixMemory", reuse_remembered_fix)) # 🧠 No LLM call for a bug we already fixed
+    builder.add_node("Classifier", timed_node("Classifier", minister_of_classification))
+    builder.add_node("Localizer", timed_node("Localizer", minister_of_localization))
+    builder.add_node("Repair", timed_node("Repair", minister_of_repair))
+    builder.add_node("Validator", timed_node("Validator", minister_of_validation))
+    builder.add_node("Sandbox", timed_node("Sandbox", execution_sandbox))
+    builder.add_node("SpeculativeRepair", timed_node("SpeculativeRepair", speculative_repair)) # 🏁 Repair + Validate + Sandbox, N at a time
+    builder.add_node("QA", timed_node("QA", minister_of_qa))          # 🧪 New Node
+    builder.add_node("GitOps", timed_node("GitOps", github_push_node))    # 🛠️ Final Node
+
+    # 1. The Startup Sequence
+    builder.add_edge(START, "FixMemory")
+    builder.add_conditional_edges(
+        "FixMemory",
+        check_memory_status,
+        {
+            "push": "GitOps",
+            "diagnose": "Classifier"
+        }
+    )
+    builder.add_edge("Classifier", "Localizer")
+    builder.add_conditional_edges(
+        "Localizer",
+        choose_repair_mode,
+        {
+            "single": "Repair",
+            "speculative": "SpeculativeRepair"
+        }
+    )
+    builder.add_edge("Repair", "Validator")
+
+    # 2. The Validation Loop
+    builder.add_conditional_edges(
+        "Validator",
+        check_validation_status,
+        {
+            "retry_format": "Repair", 
+            "execute": "Sandbox", 
+            "end": END
+        }
+    )
+
+    # 3. The Autonomous Environment Loop (The Heart of the Agent)
+    builder.add_conditional_edges(
+        "Sandbox",
+        check_sandbox_status,
+        {
+            "generate_tests": "QA",      # 🧪 Create tests if none exist
+            "retry_logic": "FixMemory",  # 🔄 Try to fix the code again (remembered fixes first)
+            "push": "GitOps",            # 🚀 Ship it to GitHub!
+            "end": END
+        }
+    )
+
+    # The speculative node already ran the sandbox, so it shares the Sandbox router
+    builder.add_conditional_edges(
+        "SpeculativeRepair",
+        check_sandbox_status,
+        {
+            "generate_tests": "QA",
+            "retry_logic": "FixMemory",
+            "push": "GitOps",
+            "end": END
+        }
+    )
+
+    # 4. Closing the QA Loop
+    # Once tests are generated, we go back to the start to find the bugs those tests reveal!
+    builder.add_edge("QA", "Classifier")
+
+    # 5. Ending the Run
+    builder.add_edge("GitOps", END)
+    return builder
+
+def compile_healing_agent(checkpointer=None):
+    """The graph, optionally persisting a checkpoint after every node (thread_id = run_id) so runs survive restarts."""
+    return _graph_builder().compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=1)
+def get_healing_agent():
+    """The graph without checkpoints, compiled on first use."""
+    return compile_healing_agent()
@@ -1,26 +1,36 @@
-from typing import TypedDict, List, Optional
-from pydantic import BaseModel
-
-# This defines the exact structure of a Fix, matching your React frontend!
-class FixRecord(BaseModel):
-    file: str
-    type: str
-    line: int
-    commitMsg: str
-    status: str
-
-# This is the "Memory" that gets passed between your Ministers
-class AgentState(TypedDict):
-    repo_url: str
-    repo_path: str          # Where it's cloned locally
-    error_message: str      # The raw error from the sandbox
-    bug_type: str           # LINTING, SYNTAX, LOGIC, etc.
-    target_file: str        # Which file has the bug
-    target_line: int        # Which line has the bug
-    file_content: str       # The actual code
-    proposed_fix: str       # The code Gemini writes
-    format_attempts: int    # To prevent infinite loops (max 3)
-    retry_count: int        # Total iteration loops (max 5)
-    fixes_applied: List[FixRecord]
-    run_status: str         # PASSED or FAILED
-    test_generated: bool
\ No newline at end of file
+import operator
+from typing import TypedDict, List, Optional, Annotated
+from pydantic import BaseModel
+from sandbox_results import TestReport
+
+# This defines the exact structure of a Fix, matching your React frontend!
+class FixRecord(BaseModel):
+    file: str
+    type: str
+    line: int
+    commitMsg: str
+    status: str
+
+# This is the "Memory" that gets passed between your Ministers
+class AgentState(TypedDict):
+    repo_url: str
+    repo_path: str          # Where it's cloned locally
+    branch_name: str        # The branch GitOps pushes and opens the PR from (TEAM_LEADER_AI_Fix)
+    error_message: str      # The compacted error log from the sandbox (what the Ministers read)
+    raw_log_id: str         # Id of the full, uncompacted sandbox log (served to the UI)
+    test_report: Optional[TestReport]  # The last test run's own report (counts, failing test IDs), None if the runner gives none
+    bug_type: str           # LINTING, SYNTAX, LOGIC, etc.
+    target_file: str        # Which file has the bug
+    target_line: int        # Which line has the bug
+    file_content: str       # The actual code
+    proposed_fix: str       # The code Gemini writes
+    failure_sites: List[dict]   # {file, line, bug_type} per failing file when a test run broke several files at once
+    proposed_fixes: dict    # file -> new content for a batch (empty on the one-fix path)
+    format_attempts: int    # To prevent infinite loops (max 3)
+    static_check_attempts: int  # Static-check rejections since the last sandbox run (max 3, then the sandbox decides)
+    retry_count: int        # Total iteration loops (max 5)
+    fixes_applied: List[FixRecord]
+    run_status: str         # PASSED or FAILED
+    test_generated: bool
+    static_diagnostics: str # Why the static checks rejected the last fix (fed back to Repair)
+    timings: Annotated[List[dict], operator.add]  # spans appended by every node (see metrics.timed_node)
\ No newline at end of file
@@ -0,0 +1,132 @@
+# backend/agents/llm_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+EVICT_EVERY_N_WRITES = 50
+
+
+def make_cache_key(model: str, messages) -> str:
+    """Content address of a prompt: model name + every message's role and text (system prompt included)."""
+    digest = hashlib.sha256(model.encode())
+    for message in messages:
+        digest.update(b"\0" + message.type.encode() + b"\0")
+        digest.update(str(message.content).encode())
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """Two-tier response cache: an in-memory LRU in front of a SQLite table with TTL and size-based eviction."""
+
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "llm_cache.sqlite"),
+                 memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 ttl: int = LLM_CACHE_TTL_SECONDS, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()      # key -> (content, created): the same TTL applies in memory as on disk
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.counters = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, content: str, created: float):
+        self._memory[key] = (content, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, minister: str = "unknown"):
+        with self._lock:
+            now = time.time()
+            if key in self._memory:
+                content, created = self._memory[key]
+                if created >= now - self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters[minister]["memory_hits"] += 1
+                    return content
+                del self._memory[key]  # expired: the disk copy is too, so this ends as a miss
+
+            row = self._db().execute(
+                "SELECT content, created FROM responses WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.counters[minister]["misses"] += 1
+                return None
+            self._db().execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db().commit()
+            self._remember(key, row[0], row[1])
+            self.counters[minister]["disk_hits"] += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            now = time.time()
+            self._remember(key, content, now)
+            self._db().execute(
+                "INSERT OR REPLACE INTO responses (key, content, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, content, len(content.encode()), now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY_N_WRITES == 0:
+                self._evict(now)
+            self._db().commit()
+
+    def delete(self, key: str):
+        """Drops an answer that turned out to be unusable, so the same prompt is sent to the model again."""
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db().execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db().commit()
+
+    def _evict(self, now: float):
+        """Drops expired rows, then least-recently-used rows until the table fits in max_bytes."""
+        db = self._db()
+        db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_minister = {}
+            for minister, counts in self.counters.items():
+                lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+                hits = counts["memory_hits"] + counts["disk_hits"]
+                per_minister[minister] = {**counts, "hit_rate": round(hits / lookups, 3) if lookups else 0.0}
+            return {"enabled": LLM_CACHE_ENABLED, "memory_entries": len(self._memory), "ministers": per_minister}
+
+
+llm_cache = LLMCache()
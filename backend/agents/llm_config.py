@@ -1,13 +1,128 @@
-# backend/agents/llm_config.py
-import os
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-load_dotenv()
-
-# Using Gemini 2 Flash for high efficiency and RPM limits
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash-001", # Using the Flash model
-    temperature=0, # Setting to 0 for maximum determinism and no hallucinations
-    google_api_key=os.getenv("GEMINI_API_KEY")
-)
\ No newline at end of file
+# backend/agents/llm_config.py
+import os
+import threading
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+import time
+from concurrency import llm_slots
+import metrics
+from .llm_cache import llm_cache, make_cache_key, LLM_CACHE_ENABLED
+
+load_dotenv()
+
+# The shared Gemini client, built by get_llm() on first use: importing langchain_google_genai alone
+# takes about half a second, which every process that imports a Minister would otherwise pay at startup.
+# Benchmarks assign their own client here.
+llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    global llm
+    if llm is None:
+        with _llm_lock:
+            if llm is None:
+                from langchain_core.rate_limiters import InMemoryRateLimiter
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                # Token bucket shared by every Minister, so concurrent runs stay under the Gemini RPM quota
+                # (default 0.25 req/s = 15 RPM) without fixed sleeps.
+                rate_limiter = InMemoryRateLimiter(
+                    requests_per_second=float(os.getenv("LLM_REQUESTS_PER_SECOND", "0.25")),
+                    check_every_n_seconds=0.1,
+                    max_bucket_size=float(os.getenv("LLM_BURST", "3"))
+                )
+                # Using Gemini 2 Flash for high efficiency and RPM limits
+                llm = ChatGoogleGenerativeAI(
+                    model="gemini-2.0-flash-001", # Using the Flash model
+                    temperature=0, # Setting to 0 for maximum determinism and no hallucinations
+                    google_api_key=os.getenv("GEMINI_API_KEY"),
+                    rate_limiter=rate_limiter
+                )
+    return llm
+
+def _cached_response(key, minister: str):
+    if not key:
+        return None
+    cached = llm_cache.get(key, minister)
+    if cached is None:
+        return None
+    print(f"--- LLM CACHE: Hit for Minister of {minister.title()} ---")
+    metrics.record("llm", minister, 0.0, cached=True)
+    return AIMessage(content=cached)
+
+def _record_usage(response, minister: str, seconds: float, **extra):
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens, completion_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metrics.LLM_TOKENS.labels(minister, "prompt").inc(prompt_tokens)
+    metrics.LLM_TOKENS.labels(minister, "completion").inc(completion_tokens)
+    metrics.record(
+        "llm", minister, seconds,
+        cached=False, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, **extra
+    )
+
+def invoke_llm(messages, minister: str = "unknown", refresh: bool = False):
+    """
+    Calls Gemini under the global cap on concurrent LLM calls (the rate limiter paces the requests).
+    At temperature 0 identical prompts give identical answers, so responses are served from the cache when possible.
+    `refresh` skips the cached answer (a retry whose last answer was rejected would just get it back)
+    and stores the new one in its place.
+    """
+    llm = get_llm()
+    key = make_cache_key(llm.model, messages) if LLM_CACHE_ENABLED else None
+    cached = _cached_response(key, minister) if not refresh else None
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    with llm_slots.acquire():
+        response = llm.invoke(messages)
+    _record_usage(response, minister, time.perf_counter() - started)
+
+    if key and isinstance(response.content, str):
+        llm_cache.put(key, response.content)
+    return response
+
+def forget_answer(messages):
+    """Removes the cached answer to `messages` once it has been rejected."""
+    if LLM_CACHE_ENABLED:
+        llm_cache.delete(make_cache_key(get_llm().model, messages))
+
+def stream_llm(messages, minister: str = "unknown", on_text=None, refresh: bool = False):
+    """
+    Like invoke_llm, but streams the answer. `on_text(text_so_far)` is called after every chunk;
+    returning False stops generation there (the partial answer is returned and never cached).
+    """
+    llm = get_llm()
+    key = make_cache_key(llm.model, messages) if LLM_CACHE_ENABLED else None
+    cached = _cached_response(key, minister) if not refresh else None
+    if cached is not None:
+        if on_text:
+            on_text(cached.content)
+        return cached
+
+    started = time.perf_counter()
+    first_chunk_at = None
+    response = None
+    cancelled = False
+    with llm_slots.acquire():
+        stream = llm.stream(messages)
+        try:
+            for chunk in stream:
+                response = chunk if response is None else response + chunk
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter() - started
+                if on_text and isinstance(response.content, str) and on_text(response.content) is False:
+                    cancelled = True
+                    break
+        finally:
+            # Closing the generator drops the HTTP stream, so Gemini stops producing tokens we'd throw away
+            stream.close()
+
+    response = response or AIMessage(content="")
+    _record_usage(
+        response, minister, time.perf_counter() - started,
+        first_chunk_seconds=round(first_chunk_at or 0.0, 3), cancelled=cancelled
+    )
+    if key and not cancelled and isinstance(response.content, str):
+        llm_cache.put(key, response.content)
+    return AIMessage(content=response.content, usage_metadata=getattr(response, "usage_metadata", None))
@@ -0,0 +1,161 @@
+# backend/agents/patching.py
+import difflib
+import os
+import re
+from dataclasses import dataclass
+
+# Minimum similarity for a fuzzy hunk match (1.0 = exact after whitespace normalization).
+PATCH_FUZZ_THRESHOLD = float(os.getenv("PATCH_FUZZ_THRESHOLD", "0.85"))
+
+SEARCH_REPLACE_RE = re.compile(
+    r'^<{5,} SEARCH[^\n]*\n(?P<search>.*?)^={5,}[^\n]*\n(?P<replace>.*?)^>{5,} REPLACE[^\n]*$',
+    re.DOTALL | re.MULTILINE
+)
+HUNK_HEADER_RE = re.compile(r'^@@ -(?P<start>\d+)(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+
+class PatchError(Exception):
+    """The model's patch could not be parsed or did not apply to the current file."""
+
+
+@dataclass
+class Edit:
+    """One change: replace the `search` lines (found near `hint_line`, if known) with the `replace` lines."""
+    search: list
+    replace: list
+    hint_line: int = 0
+
+
+def _parse_search_replace(text: str) -> list:
+    return [
+        Edit(match.group("search").splitlines(), match.group("replace").splitlines())
+        for match in SEARCH_REPLACE_RE.finditer(text)
+    ]
+
+
+def _parse_unified_diff(text: str) -> list:
+    edits = []
+    current = None
+    for line in text.splitlines():
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            current = Edit([], [], int(header.group("start")))
+            edits.append(current)
+        elif current is None or line.startswith(("--- ", "+++ ")):
+            continue
+        elif line.startswith("-"):
+            current.search.append(line[1:])
+        elif line.startswith("+"):
+            current.replace.append(line[1:])
+        elif line.startswith(" ") or line == "":
+            current.search.append(line[1:])
+            current.replace.append(line[1:])
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        else:
+            current = None  # end of the diff body
+    return edits
+
+
+def parse_patch(text: str) -> list:
+    """Search/replace blocks or unified-diff hunks -> Edits. Raises PatchError if there are none."""
+    edits = _parse_search_replace(text) or _parse_unified_diff(text)
+    edits = [edit for edit in edits if edit.search != edit.replace]
+    if not edits:
+        raise PatchError("no search/replace blocks or diff hunks found")
+    return edits
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def _locate(lines: list, edit: Edit):
+    """
+    Where `edit.search` sits in `lines`: exact match first, then ignoring whitespace, then the most
+    similar window above PATCH_FUZZ_THRESHOLD. Ties go to the match closest to the hunk's line hint.
+    Returns (start, end) line indexes.
+    """
+    size = len(edit.search)
+    if size == 0:
+        raise PatchError("empty search block")
+    hint = max(edit.hint_line - 1, 0)
+
+    for key in (lambda line: line, _normalize):
+        wanted = [key(line) for line in edit.search]
+        keyed = [key(line) for line in lines]
+        matches = [i for i in range(len(lines) - size + 1) if keyed[i:i + size] == wanted]
+        if matches:
+            start = min(matches, key=lambda i: abs(i - hint))
+            return start, start + size
+
+    best_start, best_ratio = None, 0.0
+    wanted = "\n".join(_normalize(line) for line in edit.search)
+    for start in range(max(len(lines) - size + 1, 1)):
+        window = "\n".join(_normalize(line) for line in lines[start:start + size])
+        ratio = difflib.SequenceMatcher(None, wanted, window).ratio()
+        if ratio > best_ratio or (ratio == best_ratio and best_start is not None and abs(start - hint) < abs(best_start - hint)):
+            best_start, best_ratio = start, ratio
+    if best_start is None or best_ratio < PATCH_FUZZ_THRESHOLD:
+        raise PatchError(f"hunk not found (best similarity {best_ratio:.2f}): {edit.search[0].strip()!r}")
+    return best_start, best_start + size
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _merge(search: list, replace: list, found: list) -> list:
+    """
+    The replacement as it should land in the file. Lines the edit leaves alone keep the file's exact text
+    (a fuzzy match must not reformat them), and new lines get the file's indentation, not the model's.
+    """
+    indents = {}
+    for model_line, file_line in zip(search, found):
+        if model_line.strip() and file_line.strip():
+            indents.setdefault(_indent(model_line), _indent(file_line))
+
+    pad = "\t" if any(line.startswith("\t") for line in found) else " "
+
+    def reindent(line):
+        if not line.strip() or not indents:
+            return line
+        width = _indent(line)
+        nearest = min(indents, key=lambda known: (abs(known - width), known))
+        # Scale by the model's indent unit (2 vs 4 spaces) when we have seen one
+        scales = [indents[known] / known for known in indents if known]
+        scale = scales[0] if scales else 1
+        return pad * max(round(indents[nearest] + (width - nearest) * scale), 0) + line.lstrip()
+
+    merged = []
+    # Search and replace both come from the model, so lines it kept are identical; an indentation-only
+    # change (the fix for an IndentationError) must still count as a change
+    matcher = difflib.SequenceMatcher(None, [l.rstrip() for l in search], [l.rstrip() for l in replace], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            merged.extend(found[i1:i2])
+        else:
+            merged.extend(reindent(line) for line in replace[j1:j2])
+    return merged
+
+
+def apply_patch(source: str, edits: list) -> str:
+    """Applies the edits to `source` in order and returns the new content. Raises PatchError if any edit misses."""
+    lines = source.splitlines()
+    for edit in edits:
+        start, end = _locate(lines, edit)
+        lines[start:end] = _merge(edit.search, edit.replace, lines[start:end])
+    newline = "\r\n" if "\r\n" in source else "\n"  # keep the file's line endings
+    result = newline.join(lines)
+    if result == newline.join(source.splitlines()):
+        raise PatchError("patch applied but changed nothing")
+    return result + newline if source.endswith("\n") or not source else result
+
+
+def search_matches(source: str, search: list) -> bool:
+    """Whether a search block would be found in `source` (lets a streaming patch be rejected before it ends)."""
+    try:
+        _locate(source.splitlines(), Edit(search, []))
+        return True
+    except PatchError:
+        return False
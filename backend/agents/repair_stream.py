@@ -0,0 +1,136 @@
+# backend/agents/repair_stream.py
+import os
+import re
+from .patching import SEARCH_REPLACE_RE, Edit, PatchError, apply_patch, search_matches
+
+# A patch_progress event at most every N streamed characters (plus one per phase change).
+PATCH_PROGRESS_EVERY_CHARS = int(os.getenv("PATCH_PROGRESS_EVERY_CHARS", "200"))
+# An answer that has produced this much text without a COMMIT line / code block is not going to be usable.
+STREAM_MAX_PREAMBLE_CHARS = int(os.getenv("STREAM_MAX_PREAMBLE_CHARS", "2000"))
+
+COMMIT_LINE_RE = re.compile(r'COMMIT:[ \t]*(.*)\n')
+SEARCH_DONE_RE = re.compile(r'^<{5,} SEARCH[^\n]*\n(?P<search>.*?)^={5,}[^\n]*\n', re.DOTALL | re.MULTILINE)
+PREVIEW_CHARS = 160
+
+
+def _stream_writer():
+    """The graph's custom stream, or a no-op when called outside a graph run (scripts, benchmarks of one node)."""
+    from langgraph.config import get_stream_writer  # already loaded by the graph; spares importers of a Minister
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda payload: None
+
+
+class StreamMonitor:
+    """
+    Watches a Minister's answer while it streams (pass it as stream_llm's `on_text`).
+    Publishes patch_progress events to the SSE feed and returns False as soon as the answer is
+    clearly unusable, so generation stops there instead of running to the end.
+
+    `expect`: "patch" (COMMIT + search/replace blocks), "rewrite" (COMMIT + ```python block)
+    or "code" (a ```python block only, e.g. QA).
+    `cancelled`: a threading.Event that stops the stream once set (a speculative candidate that lost the race).
+    """
+
+    def __init__(self, minister: str, expect: str, source: str = "", variant: int = 0, cancelled=None):
+        self.minister = minister
+        self.cancelled = cancelled
+        self.expect = expect
+        self.variant = variant
+        self.patched = source
+        self.commit_msg = None
+        self.phase = "commit" if expect != "code" else "preamble"
+        self.reason = None
+        self._blocks_applied = 0
+        self._searches_checked = 0
+        self._chars = 0
+        self._last_emit = 0
+        self._emit = _stream_writer()
+
+    def __call__(self, text: str) -> bool:
+        self._chars = len(text)
+        if self.cancelled is not None and self.cancelled.is_set():
+            self.reason = "another candidate already won"
+            print(f"✂️ STREAM: Cancelled the {self.minister} answer after {self._chars} chars ({self.reason})")
+            self._publish(text, "cancelled")
+            return False
+        problem = self._check_commit(text) if self.expect != "code" else None
+        if problem is None and self.expect == "patch":
+            problem = self._check_patch(text)
+        elif problem is None:
+            problem = self._check_code(text)
+        if problem:
+            self.reason = problem
+            print(f"✂️ STREAM: Cancelled the {self.minister} answer after {self._chars} chars ({problem})")
+            self._publish(text, "cancelled")
+            return False
+        if self._chars - self._last_emit >= PATCH_PROGRESS_EVERY_CHARS:
+            self._publish(text)
+        return True
+
+    def finish(self, text: str):
+        """Sends the closing event once the stream has ended normally."""
+        if self.reason is None:
+            self._publish(text, "done")
+
+    def _check_commit(self, text: str):
+        if self.commit_msg is not None:
+            return None
+        match = COMMIT_LINE_RE.search(text)
+        if not match:
+            return "no COMMIT line" if len(text) > STREAM_MAX_PREAMBLE_CHARS else None
+        self.commit_msg = match.group(1).strip()
+        self._set_phase("search" if self.expect == "patch" else "code", text)
+        if not self.commit_msg.startswith("[AI-AGENT]"):
+            return f"commit message {self.commit_msg[:40]!r} lacks the [AI-AGENT] prefix"
+        return None
+
+    def _check_patch(self, text: str):
+        # Blocks that are complete are applied, so later blocks are checked against the file as it will be
+        blocks = list(SEARCH_REPLACE_RE.finditer(text))
+        for block in blocks[self._blocks_applied:]:
+            edit = Edit(block.group("search").splitlines(), block.group("replace").splitlines())
+            if edit.search != edit.replace:
+                try:
+                    self.patched = apply_patch(self.patched, [edit])
+                except PatchError:
+                    pass  # already reported when its search half was checked
+        self._blocks_applied = len(blocks)
+
+        searches = list(SEARCH_DONE_RE.finditer(text))
+        for search in searches[self._searches_checked:]:
+            lines = search.group("search").splitlines()
+            if not search_matches(self.patched, lines):
+                first = next((line.strip() for line in lines if line.strip()), "")
+                return f"search block not in the file: {first[:60]!r}"
+        self._searches_checked = len(searches)
+        if len(searches) > len(blocks):
+            self._set_phase("replace", text)
+        elif blocks:
+            self._set_phase("search", text)
+        return None
+
+    def _check_code(self, text: str):
+        if "```" in text:
+            self._set_phase("code", text)
+        elif len(text) > STREAM_MAX_PREAMBLE_CHARS:
+            return "no code block"
+        return None
+
+    def _set_phase(self, phase: str, text: str):
+        if phase != self.phase:
+            self.phase = phase
+            self._publish(text)
+
+    def _publish(self, text: str, phase: str = None):
+        self._last_emit = self._chars
+        self._emit({
+            "minister": self.minister,
+            "variant": self.variant,
+            "phase": phase or self.phase,
+            "chars": self._chars,
+            "commit": self.commit_msg,
+            "reason": self.reason,
+            "preview": text[-PREVIEW_CHARS:],
+        })
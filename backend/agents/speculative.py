@@ -0,0 +1,145 @@
+# backend/agents/speculative.py
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from concurrency import MAX_CONCURRENT_SANDBOXES, MAX_CONCURRENT_LLM_CALLS
+from workspace import get_workspace_manager
+from sandbox_results import compact_report
+from .graph_state import AgentState
+from .ministers import generate_fix, is_well_formed_fix, apply_and_test, remember_fixes
+from .static_checks import check_fix
+
+# How many candidate fixes to race per iteration. 1 = the classic Repair -> Validator -> Sandbox path.
+SPECULATIVE_WIDTH = int(os.getenv("SPECULATIVE_WIDTH", "1"))
+
+
+def speculative_width() -> int:
+    """Fan-out width, never more than the sandbox and LLM concurrency caps allow."""
+    return max(1, min(SPECULATIVE_WIDTH, MAX_CONCURRENT_SANDBOXES, MAX_CONCURRENT_LLM_CALLS))
+
+
+class _Race:
+    """Shared by the candidates of one round: the first green one claims the win, the others stop where they can."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        """True for exactly one caller (check-then-set under a lock: two candidates can pass at the same moment)."""
+        with self._lock:
+            if self.cancelled.is_set():
+                return False
+            self.cancelled.set()
+            return True
+
+
+def _run_candidate(state: AgentState, variant: int, race: _Race):
+    """Generate -> validate -> test one candidate in its own copy-on-write view of the repo."""
+    if race.cancelled.is_set():
+        return None
+    # The race's Event cuts the LLM stream and the sandbox run short once another candidate has won
+    code, commit_msg = generate_fix(state, variant=variant, cancelled=race.cancelled)
+    if race.cancelled.is_set():
+        return None
+    outcome = {"variant": variant, "code": code, "commit_msg": commit_msg, "result": None}
+    if not is_well_formed_fix(commit_msg, code):
+        outcome["result"] = {"passed": False, "error_logs": state.get("error_message", "")}
+        return outcome
+    diagnostics = check_fix(state.get("repo_path", ""), state.get("target_file", ""), code)
+    if diagnostics:
+        # Broken before it runs: no sandbox for this candidate
+        outcome["result"] = {"passed": False, "error_logs": state.get("error_message", "")}
+        outcome["diagnostics"] = "\n".join(diagnostics)
+        return outcome
+    if race.cancelled.is_set():
+        return None
+
+    manager = get_workspace_manager(state.get("repo_path", ""))
+    with manager.view() as workspace:
+        outcome["result"] = apply_and_test(
+            workspace, {state.get("target_file", ""): code}, state.get("error_message", ""), state.get("test_report"),
+            cancelled=race.cancelled
+        )
+        if outcome["result"].get("cancelled"):
+            return None
+        if outcome["result"].get("passed", False) and race.claim():
+            # Promote before the view goes back to be reused; only the candidate that claimed the race gets here
+            remember_fixes({**state, "fixes_applied": [{"file": state.get("target_file", ""), "commitMsg": commit_msg}]},
+                           {state.get("target_file", ""): code})
+            workspace.promote()
+            outcome["promoted"] = True
+    return outcome
+
+
+def speculative_repair(state: AgentState) -> AgentState:
+    """
+    Races several candidate fixes, each tested in its own workspace and sandbox.
+    The first green candidate is written into the real repo. The others are stopped where they are:
+    their LLM streams are cut and their test runs killed (containers removed), so waiting for them
+    before the node returns costs a moment, not the slowest candidate's run, and no candidate is
+    still using its view when the run's views are released.
+    """
+    width = speculative_width()
+    print(f"--- SPECULATIVE REPAIR: Racing {width} candidate fixes ---")
+
+    race = _Race()
+    executor = ThreadPoolExecutor(max_workers=width, thread_name_prefix="candidate")
+    # Each candidate runs in a copy of this context, so its LLM and sandbox spans count towards this node
+    futures = [
+        executor.submit(contextvars.copy_context().run, _run_candidate, state, variant, race)
+        for variant in range(width)
+    ]
+
+    winner = None
+    failures = []
+    for future in as_completed(futures):
+        try:
+            outcome = future.result()
+        except Exception as e:
+            print(f"⚠️ SPECULATIVE REPAIR: Candidate crashed: {str(e)}")
+            continue
+        if outcome is None:
+            continue
+        if outcome.get("promoted"):
+            winner = outcome
+            break
+        failures.append(outcome)
+    executor.shutdown(wait=True, cancel_futures=True)
+
+    fix = {
+        "file": state.get("target_file", "unknown"),
+        "type": state.get("bug_type", "LOGIC"),
+        "line": state.get("target_line", 0),
+    }
+
+    if winner:
+        print(f"✅ SPECULATIVE REPAIR: Candidate #{winner['variant'] + 1} passed and was committed to the checkout.")
+        fix.update({"commitMsg": winner["commit_msg"], "status": "SUCCESS"})
+        return {
+            "run_status": "TESTS_PASSED",
+            "proposed_fix": winner["code"],
+            "test_report": compact_report(winner["result"].get("report")),
+            "fixes_applied": state.get("fixes_applied", []) + [fix]
+        }
+
+    print("❌ SPECULATIVE REPAIR: No candidate passed.")
+    # Report the most conventional candidate's failure so the next iteration sees a real log
+    failures.sort(key=lambda outcome: outcome["variant"])
+    best = failures[0] if failures else {"commit_msg": "[AI-AGENT] Attempted automated fix", "code": "", "result": {}}
+    fix.update({"commitMsg": best["commit_msg"], "status": "FAILED"})
+    return {
+        "run_status": "TESTS_FAILED",
+        "proposed_fix": best["code"],
+        "error_message": best["result"].get("error_logs", state.get("error_message", "")),
+        "static_diagnostics": best.get("diagnostics", ""),
+        "raw_log_id": best["result"].get("raw_log_id", ""),
+        # Candidates that never reached a sandbox leave the previous run's report in place
+        "test_report": compact_report(best["result"]["report"]) if "report" in best["result"] else state.get("test_report"),
+        "retry_count": state.get("retry_count", 0) + 1,
+        "format_attempts": 0,
+        "static_check_attempts": 0,
+        "fixes_applied": state.get("fixes_applied", []) + [fix]
+    }
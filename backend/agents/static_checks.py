@@ -0,0 +1,276 @@
+# backend/agents/static_checks.py
+import ast
+import importlib.util
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import Counter
+import metrics
+
+# Turns the whole gate off (every fix goes straight to the sandbox).
+STATIC_CHECKS_ENABLED = os.getenv("STATIC_CHECKS_ENABLED", "1") == "1"
+# "auto" = ruff if it is on PATH, else pyflakes if installed, else skip; "off" = never lint.
+STATIC_CHECK_LINTER = os.getenv("STATIC_CHECK_LINTER", "auto")
+NODE_CHECK_TIMEOUT = int(os.getenv("NODE_CHECK_TIMEOUT", "10"))
+
+JS_EXTENSIONS = (".js", ".mjs", ".cjs")
+DEPENDENCY_MANIFESTS = ("requirements.txt", "requirements-dev.txt", "pyproject.toml", "setup.py", "setup.cfg", "Pipfile")
+# Lint codes that mean the file will fail at runtime, not style: undefined names and names used before assignment.
+FATAL_RUFF_CODES = "F821,F822,F823"
+FATAL_PYFLAKES_MESSAGES = ("UndefinedName", "UndefinedExport", "UndefinedLocal")
+# "file:line:col: " (ruff and pyflakes both start with it): dropped when matching a fix's diagnostics against the original's
+POSITION_RE = re.compile(r'^.*?:\d+:\d+:\s*')
+# How rejections are bucketed in the stats (first match in the first diagnostic; anything else is "Lint").
+ERROR_KINDS = ("IndentationError", "TabError", "SyntaxError", "ModuleNotFoundError", "ImportError")
+
+static_check_stats = {"checked": 0, "rejected": 0, "sandbox_boots_avoided": 0, "rejections_by_check": {}}
+_stats_lock = threading.Lock()
+
+
+def _syntax_diagnostic(target_file: str, error: SyntaxError) -> str:
+    line = f"{target_file}:{error.lineno}:{error.offset or 0}: {type(error).__name__}: {error.msg}"
+    if error.text:
+        line += f"\n    {error.text.rstrip()}\n    {' ' * max((error.offset or 1) - 1, 0)}^"
+    return line
+
+
+def _top_level_names(tree: ast.Module):
+    """Names a module defines at top level, or None if it can export names we cannot see (star imports, __getattr__)."""
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            if node.name == "__getattr__":
+                return None
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            if any(alias.name == "*" for alias in node.names):
+                return None
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, (ast.If, ast.Try, ast.With)):
+            return None  # conditional definitions: too dynamic to judge
+    return names
+
+
+def _repo_module(repo_path: str, base_dir: str, dotted: str):
+    """Path of a module or package inside the repo, or None."""
+    parts = dotted.split(".") if dotted else []
+    for root in (base_dir, repo_path, os.path.join(repo_path, "src")):
+        path = os.path.join(root, *parts)
+        for candidate in (path + ".py", os.path.join(path, "__init__.py")):
+            if parts and os.path.isfile(candidate):
+                return candidate
+        if parts and os.path.isdir(path):
+            return path  # namespace package
+    return None
+
+
+def _declared_dependencies(repo_path: str) -> str:
+    text = ""
+    for name in DEPENDENCY_MANIFESTS:
+        path = os.path.join(repo_path, name)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text += f.read().lower()
+    return re.sub(r"[-_.]", "_", text)
+
+
+def _import_diagnostics(repo_path: str, target_file: str, tree: ast.Module, original_tree) -> list:
+    """
+    Imports the fix introduced that cannot resolve: modules that are neither in the repo, the stdlib,
+    the dependency manifests nor this interpreter, and names missing from the repo's own modules.
+    Imports the original file already had are trusted (the sandbox image may have packages we don't).
+    """
+    def signature(node):
+        return (type(node).__name__, getattr(node, "module", None), node.level if isinstance(node, ast.ImportFrom) else 0,
+                tuple(alias.name for alias in node.names))
+
+    known = set()
+    if original_tree is not None:
+        known = {signature(node) for node in ast.walk(original_tree) if isinstance(node, (ast.Import, ast.ImportFrom))}
+
+    base_dir = os.path.dirname(os.path.join(repo_path, target_file))
+    dependencies = None
+    diagnostics = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)) or signature(node) in known:
+            continue
+        if isinstance(node, ast.ImportFrom) and node.level:
+            # Relative import: resolve against the file's package directory
+            package_dir = base_dir
+            for _ in range(node.level - 1):
+                package_dir = os.path.dirname(package_dir)
+            module_path = _repo_module(package_dir, package_dir, node.module or "") if node.module else os.path.join(package_dir, "__init__.py")
+            if node.module and module_path is None:
+                diagnostics.append(f"{target_file}:{node.lineno}: ImportError: relative module '{'.' * node.level}{node.module}' does not exist")
+                continue
+            modules = [(module_path, node)]
+        else:
+            modules = []
+            names = [node.module] if isinstance(node, ast.ImportFrom) else [alias.name for alias in node.names]
+            for dotted in names:
+                if not dotted:
+                    continue
+                module_path = _repo_module(repo_path, base_dir, dotted)
+                if module_path:
+                    modules.append((module_path, node))
+                    continue
+                root = dotted.split(".")[0]
+                if root in sys.stdlib_module_names or root in sys.builtin_module_names:
+                    continue
+                if dependencies is None:
+                    dependencies = _declared_dependencies(repo_path)
+                if root.lower() in dependencies or importlib.util.find_spec(root) is not None:
+                    continue
+                diagnostics.append(f"{target_file}:{node.lineno}: ModuleNotFoundError: No module named '{root}' (not in the repo nor its dependencies)")
+
+        # `from repo_module import name`: the name has to exist there
+        if isinstance(node, ast.ImportFrom):
+            for module_path, _ in modules:
+                if not module_path or not module_path.endswith(".py"):
+                    continue
+                try:
+                    with open(module_path, "r", encoding="utf-8") as f:
+                        exported = _top_level_names(ast.parse(f.read()))
+                except (OSError, SyntaxError, ValueError):
+                    continue
+                if exported is None:
+                    continue
+                for alias in node.names:
+                    submodule = os.path.join(os.path.dirname(module_path), alias.name)
+                    if alias.name != "*" and alias.name not in exported and not (
+                        module_path.endswith("__init__.py") and (os.path.isfile(submodule + ".py") or os.path.isdir(submodule))
+                    ):
+                        diagnostics.append(f"{target_file}:{node.lineno}: ImportError: cannot import name '{alias.name}' from '{node.module or '.'}'")
+    return diagnostics
+
+
+def _lint_diagnostics(target_file: str, code: str) -> list:
+    """Undefined names and the like, from ruff or pyflakes when one of them is available."""
+    if STATIC_CHECK_LINTER == "off":
+        return []
+    if shutil.which("ruff"):
+        try:
+            result = subprocess.run(
+                ["ruff", "check", "--no-cache", "--select", FATAL_RUFF_CODES, "--output-format", "concise",
+                 "--stdin-filename", target_file, "-"],
+                input=code, capture_output=True, text=True, timeout=NODE_CHECK_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            return []
+        return [line for line in result.stdout.splitlines() if re.search(r":\d+:\d+: F8", line)]
+    try:
+        from pyflakes.api import check
+        from pyflakes.reporter import Reporter
+    except ImportError:
+        return []
+
+    class Collector(Reporter):
+        def __init__(self):
+            self.messages = []
+
+        def flake(self, message):
+            if type(message).__name__ in FATAL_PYFLAKES_MESSAGES:
+                self.messages.append(str(message))
+
+        def syntaxError(self, *args):
+            pass
+
+        def unexpectedError(self, *args):
+            pass
+
+    collector = Collector()
+    check(code, target_file, collector)
+    return collector.messages
+
+
+def _new_lint_diagnostics(target_file: str, code: str, original: str) -> list:
+    """
+    Lint diagnostics the fix introduced. Ones the original file already had (a name defined at runtime,
+    a star import the linter can't see through) are not the fix's fault; they are matched by message, since lines move.
+    """
+    diagnostics = _lint_diagnostics(target_file, code)
+    if not diagnostics or not original:
+        return diagnostics
+    baseline = Counter(POSITION_RE.sub("", line) for line in _lint_diagnostics(target_file, original))
+    new = []
+    for line in diagnostics:
+        message = POSITION_RE.sub("", line)
+        if baseline[message]:
+            baseline[message] -= 1
+        else:
+            new.append(line)
+    return new
+
+
+def _python_diagnostics(repo_path: str, target_file: str, code: str, original: str) -> list:
+    try:
+        tree = ast.parse(code, filename=target_file)
+        compile(tree, target_file, "exec")
+    except SyntaxError as e:  # IndentationError and TabError included
+        return [_syntax_diagnostic(target_file, e)]
+    try:
+        original_tree = ast.parse(original) if original else None
+    except SyntaxError:
+        original_tree = None
+    return _import_diagnostics(repo_path, target_file, tree, original_tree) + _new_lint_diagnostics(target_file, code, original)
+
+
+def _js_diagnostics(target_file: str, code: str) -> list:
+    if not shutil.which("node"):
+        return []
+    suffix = os.path.splitext(target_file)[1]
+    with tempfile.NamedTemporaryFile("w", suffix=suffix, encoding="utf-8", delete=False) as f:
+        f.write(code)
+        path = f.name
+    try:
+        result = subprocess.run(["node", "--check", path], capture_output=True, text=True, timeout=NODE_CHECK_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return []
+    finally:
+        os.remove(path)
+    if result.returncode == 0:
+        return []
+    # node prints "<path>:<line>\n<source line>\n<caret>\n\nSyntaxError: ...\n    at <node internals>"
+    lines = result.stderr.replace(path, target_file).strip().splitlines()
+    return ["\n".join(line for line in lines if line.strip() and not line.lstrip().startswith(("at ", "Node.js")))]
+
+
+def check_fix(repo_path: str, target_file: str, code: str) -> list:
+    """
+    Cheap in-process checks on a proposed file before it is worth a sandbox boot.
+    Returns human-readable diagnostics (file:line: problem); an empty list means "go ahead".
+    """
+    if not STATIC_CHECKS_ENABLED or not target_file:
+        return []
+    original = ""
+    original_path = os.path.join(repo_path, target_file)
+    if os.path.isfile(original_path):
+        with open(original_path, "r", encoding="utf-8", errors="replace") as f:
+            original = f.read()
+
+    if target_file.endswith(".py"):
+        diagnostics = _python_diagnostics(repo_path, target_file, code, original)
+    elif target_file.endswith(JS_EXTENSIONS):
+        diagnostics = _js_diagnostics(target_file, code)
+    else:
+        return []
+
+    with _stats_lock:
+        static_check_stats["checked"] += 1
+        if diagnostics:
+            static_check_stats["rejected"] += 1
+            # Each rejected fix is one sandbox run (and the loop back through Classifier/Localizer) we skipped
+            static_check_stats["sandbox_boots_avoided"] += 1
+            kind = next((name for name in ERROR_KINDS if name in diagnostics[0]), "Lint")
+            static_check_stats["rejections_by_check"][kind] = static_check_stats["rejections_by_check"].get(kind, 0) + 1
+    if diagnostics:
+        metrics.STATIC_REJECTIONS.labels(kind).inc()
+    return diagnostics
@@ -0,0 +1,227 @@
+# backend/agents/traceback_analyzer.py
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Below this, the Classifier/Localizer ask Gemini instead of trusting the rules.
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+# Traceback frame:   File "/app/calc.py", line 3, in add     (optionally behind pytest's "E   " prefix)
+FRAME_RE = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)')
+# pytest location:   calc.py:3: in add   /   calc.py:3: TypeError
+PYTEST_LOCATION_RE = re.compile(r'^(?P<file>[\w./\\-]+\.py):(?P<line>\d+):(?:\s|$)', re.MULTILINE)
+# Exception line:    TypeError: unsupported operand...   /   E   NameError: name 'pd' is not defined
+EXCEPTION_RE = re.compile(
+    r'^\s*(?:E\s+)?(?P<exc>(?:[A-Za-z_]\w*\.)*[A-Z]\w*(?:Error|Exception))(?::\s*(?P<msg>.*))?\s*$',
+    re.MULTILINE
+)
+# pytest failure location, which is the only place a bare `assert` failure names its exception:
+#                    tests/test_calc.py:4: AssertionError
+PYTEST_EXCEPTION_RE = re.compile(r'^[\w./\\-]+\.py:\d+: (?P<exc>[A-Z]\w*(?:Error|Exception))\s*$', re.MULTILINE)
+# Where one failure ends and the next begins: pytest section headers, or a new plain traceback.
+PYTEST_SECTION_RE = re.compile(r'^(?:_{3,}|={3,}) .+ (?:_{3,}|={3,})\s*$', re.MULTILINE)
+TRACEBACK_START_RE = re.compile(r'^\s*Traceback \(most recent call last\):', re.MULTILINE)
+
+BUG_TYPES = {
+    "IndentationError": "INDENTATION",
+    "TabError": "INDENTATION",
+    "SyntaxError": "SYNTAX",
+    "ImportError": "IMPORT",
+    "ModuleNotFoundError": "IMPORT",
+    "NameError": "IMPORT",
+    "TypeError": "TYPE_ERROR",
+    "AssertionError": "LOGIC",
+}
+
+# Most fundamental first: a syntax error hides everything after it.
+BUG_TYPE_PRIORITY = ["INDENTATION", "SYNTAX", "IMPORT", "TYPE_ERROR", "LOGIC"]
+
+IGNORED_PATH_MARKERS = ("site-packages", "dist-packages", "/usr/lib/", "/usr/local/lib/", "<frozen", "<string>")
+
+# Parts of an exception message that change between two runs of the same bug (addresses, paths, numbers).
+MESSAGE_NOISE = (
+    (re.compile(r'0x[0-9a-fA-F]+'), "<addr>"),
+    (re.compile(r'(?:[\w.-]*[/\\])+([\w.-]+)'), r"\1"),
+    (re.compile(r'(?<![\w<])-?\d+(?:\.\d+)?\b'), "<n>"),
+)
+# pytest's own failure line when the exception line has no message:   E       assert 3 == 5
+PYTEST_DETAIL_RE = re.compile(r'^E\s+(?P<detail>\S.*?)\s*$', re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class FailureSite:
+    """What the rules could tell about one failure in the log."""
+    exception: str
+    bug_type: str
+    file: str
+    line: int
+    confidence: float
+
+
+@dataclass(frozen=True)
+class ErrorSignature:
+    """One failure with the run-specific details stripped, so the same bug looks the same next time."""
+    exception: str
+    message: str        # normalized: no addresses, directories or numbers
+    frames: tuple       # file names along the traceback, without line numbers
+    file: str           # where the rules place the bug (as in FailureSite)
+    line: int
+
+
+def is_test_file(path: str) -> bool:
+    name = os.path.basename(path)
+    parts = path.replace("\\", "/").split("/")
+    return (
+        name.startswith("test_") or name.endswith("_test.py")
+        or name == "conftest.py" or "tests" in parts[:-1] or "test" in parts[:-1]
+    )
+
+
+def _normalize_path(path: str, repo_path: str) -> str:
+    path = path.replace("\\", "/")
+    for prefix in ("/app/", "./"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    if repo_path:
+        repo_prefix = os.path.abspath(repo_path).replace("\\", "/").rstrip("/") + "/"
+        if path.startswith(repo_prefix):
+            path = path[len(repo_prefix):]
+    return path
+
+
+def _frames(block: str, repo_path: str) -> list:
+    """(file, line, offset) for every traceback frame or pytest location inside a block, in log order."""
+    frames = []
+    for regex in (FRAME_RE, PYTEST_LOCATION_RE):
+        for match in regex.finditer(block):
+            raw_file = match.group("file")
+            if any(marker in raw_file for marker in IGNORED_PATH_MARKERS):
+                continue
+            frames.append((_normalize_path(raw_file, repo_path), int(match.group("line")), match.start()))
+    frames.sort(key=lambda frame: frame[2])
+    return frames
+
+
+def _in_repo(path: str, repo_path: str) -> bool:
+    return not repo_path or os.path.exists(os.path.join(repo_path, path))
+
+
+def source_for_test(test_file: str, repo_path: str):
+    """THE ASSERTION TRAP: test_calculator.py usually tests calculator.py."""
+    name = os.path.basename(test_file)
+    if name.startswith("test_"):
+        candidate = name[len("test_"):]
+    elif name.endswith("_test.py"):
+        candidate = name[:-len("_test.py")] + ".py"
+    else:
+        return None
+    directory = os.path.dirname(test_file)
+    search_dirs = [directory, os.path.dirname(directory), ""] if directory else [""]
+    for folder in search_dirs:
+        path = os.path.join(folder, candidate) if folder else candidate
+        if _in_repo(path, repo_path):
+            return path
+    return None
+
+
+def _analyze_block(exception: str, block: str, repo_path: str):
+    short_name = exception.split(".")[-1]
+    bug_type = BUG_TYPES.get(short_name, "LOGIC")
+    known = short_name in BUG_TYPES
+    frames = _frames(block, repo_path)
+
+    # Innermost frame that is real source code in this repo (never a test file).
+    source_frames = [f for f in frames if not is_test_file(f[0]) and _in_repo(f[0], repo_path)]
+    if source_frames:
+        file, line, _ = source_frames[-1]
+        return FailureSite(short_name, bug_type, file, line, 0.95 if known else 0.6)
+
+    # Only test frames: map the test file back to the module under test.
+    test_frames = [f for f in frames if is_test_file(f[0])]
+    if test_frames:
+        source = source_for_test(test_frames[-1][0], repo_path)
+        if source:
+            return FailureSite(short_name, bug_type, source, 0, 0.85 if known else 0.6)
+    return FailureSite(short_name, bug_type, "unknown", 0, 0.3)
+
+
+def _split_failures(error_logs: str) -> list:
+    """One chunk of log per failure: pytest sections if present, otherwise one chunk per traceback."""
+    boundaries = [m.start() for m in PYTEST_SECTION_RE.finditer(error_logs)]
+    if not boundaries:
+        boundaries = [m.start() for m in TRACEBACK_START_RE.finditer(error_logs)]
+    starts = [0] + boundaries
+    ends = boundaries + [len(error_logs)]
+    return [error_logs[start:end] for start, end in zip(starts, ends) if start < end]
+
+
+def _last_exception(block: str):
+    matches = list(EXCEPTION_RE.finditer(block)) + list(PYTEST_EXCEPTION_RE.finditer(block))
+    if not matches:
+        return None
+    return max(matches, key=lambda match: match.start()).group("exc")
+
+
+@lru_cache(maxsize=64)
+def analyze_failures(error_logs: str, repo_path: str = "") -> tuple:
+    """Returns one FailureSite per distinct failure in the log, most fundamental bug type first."""
+    sites = []
+    for block in _split_failures(error_logs or ""):
+        exception = _last_exception(block)
+        if exception is None:
+            continue
+        site = _analyze_block(exception, block, repo_path)
+        if site not in sites:
+            sites.append(site)
+    sites.sort(key=lambda site: BUG_TYPE_PRIORITY.index(site.bug_type))
+    return tuple(sites)
+
+
+def analyze_error_log(error_logs: str, repo_path: str = ""):
+    """The single most fundamental failure in the log, or None if the log has no recognizable exception."""
+    sites = analyze_failures(error_logs, repo_path or "")
+    return sites[0] if sites else None
+
+
+def _normalize_message(message: str) -> str:
+    for regex, replacement in MESSAGE_NOISE:
+        message = regex.sub(replacement, message)
+    return " ".join(message.split())
+
+
+def _exception_message(block: str, exception: str) -> str:
+    messages = [m.group("msg") for m in EXCEPTION_RE.finditer(block) if m.group("exc") == exception and m.group("msg")]
+    if messages:
+        return messages[-1]
+    details = [m.group("detail") for m in PYTEST_DETAIL_RE.finditer(block)]
+    return details[0] if details else ""
+
+
+def error_signature(error_logs: str, repo_path: str = "", target_file: str = None):
+    """
+    Signature of the most fundamental failure in the log (or of the first failure located in `target_file`),
+    or None if there is no recognizable exception.
+    """
+    best = None
+    for block in _split_failures(error_logs or ""):
+        exception = _last_exception(block)
+        if exception is None:
+            continue
+        site = _analyze_block(exception, block, repo_path)
+        if target_file is not None and site.file != target_file:
+            continue
+        rank = BUG_TYPE_PRIORITY.index(site.bug_type)
+        if best is None or rank < best[0]:
+            best = (rank, exception, block, site)
+    if best is None:
+        return None
+    _, exception, block, site = best
+    frames = []
+    for file, _, _ in _frames(block, repo_path):
+        name = os.path.basename(file)
+        if not frames or frames[-1] != name:
+            frames.append(name)
+    return ErrorSignature(
+        site.exception, _normalize_message(_exception_message(block, exception)), tuple(frames), site.file, site.line
+    )
@@ -0,0 +1,81 @@
+"""
+Times a cold `import main` in fresh interpreters and fails when startup goes over budget.
+
+    python -m benchmarks.bench_startup --runs 5 --budget 1.0
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Loaded when the graph is first built (the lifespan warm-up), never by `import main`
+LAZY_MODULES = ("langgraph", "langchain_core", "langchain_google_genai", "google.genai", "agents.ministers")
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+\d+ \|\s+(?P<cumulative>\d+) \|(?P<indent> +)(?P<module>\S+)$', re.MULTILINE)
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import main
+print(f"SECONDS {time.perf_counter() - started}")
+print("EAGER " + " ".join(name for name in sys.argv[1:] if name in sys.modules))
+"""
+
+
+def _slowest_imports(importtime: str, count: int = 5) -> list:
+    """main's direct imports by cumulative time (`-X importtime` lists children before their parent, one indent deeper)."""
+    entries = [(len(m.group("indent")) // 2, m.group("module"), int(m.group("cumulative"))) for m in IMPORTTIME_RE.finditer(importtime)]
+    end = next((i for i, (level, module, _) in enumerate(entries) if level == 0 and module == "main"), None)
+    if end is None:
+        return []
+    start = max((i for i, (level, _, _) in enumerate(entries[:end]) if level == 0), default=-1) + 1
+    children = [(module, cumulative) for level, module, cumulative in entries[start:end] if level == 1]
+    return sorted(children, key=lambda child: -child[1])[:count]
+
+
+def probe(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, *LAZY_MODULES],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    seconds = float(re.search(r'^SECONDS (\S+)$', result.stdout, re.MULTILINE).group(1))
+    eager = re.search(r'^EAGER(.*)$', result.stdout, re.MULTILINE).group(1).split()
+    return {"seconds": seconds, "eager": eager, "slowest": _slowest_imports(result.stderr)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="allowed median import time, seconds")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    probe(env)  # compiles the .pyc files, so every timed run reads the same cache
+    runs = [probe(env) for _ in range(args.runs)]
+    timings = sorted(run["seconds"] for run in runs)
+    median = statistics.median(timings)
+    typical = min(runs, key=lambda run: abs(run["seconds"] - median))
+
+    print(f"\n📊 import main over {args.runs} runs: p50 {median:.3f}s, min {timings[0]:.3f}s, max {timings[-1]:.3f}s (budget {args.budget:.3f}s)")
+    for module, micros in typical["slowest"]:
+        print(f"   {module:<28} {micros / 1e6:.3f}s")
+
+    failed = False
+    eager = sorted({name for run in runs for name in run["eager"]})
+    if eager:
+        print(f"\n❌ Imported at startup, should load with the graph: {', '.join(eager)}")
+        failed = True
+    if median > args.budget:
+        print(f"\n❌ Startup over budget: {median:.3f}s > {args.budget:.3f}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\n✅ Startup within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+collect_ignore = ["corpus"]  # deliberately broken repos, not tests of this project
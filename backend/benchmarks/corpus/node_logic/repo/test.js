@@ -0,0 +1,5 @@
+const assert = require("assert");
+const { multiply } = require("./math");
+
+assert.strictEqual(multiply(3, 4), 12);
+console.log("all tests passed");
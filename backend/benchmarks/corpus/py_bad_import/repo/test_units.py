@@ -0,0 +1,5 @@
+from units import to_cm
+
+
+def test_to_cm():
+    assert to_cm(2) == 200
@@ -0,0 +1,5 @@
+from helpers import scale
+
+
+def to_cm(meters):
+    return scale(meters, 10)
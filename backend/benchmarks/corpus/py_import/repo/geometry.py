@@ -0,0 +1,2 @@
+def hypotenuse(a, b):
+    return math.sqrt(a ** 2 + b ** 2)
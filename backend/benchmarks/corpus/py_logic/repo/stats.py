@@ -0,0 +1,6 @@
+def mean(values):
+    return sum(values) / (len(values) + 1)
+
+
+def total(values):
+    return sum(values)
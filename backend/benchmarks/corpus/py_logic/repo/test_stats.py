@@ -0,0 +1,9 @@
+from stats import mean, total
+
+
+def test_mean():
+    assert mean([2, 4, 6]) == 4
+
+
+def test_total():
+    assert total([1, 2]) == 3
@@ -0,0 +1,2 @@
+def add_tax(amount, rate):
+    return amount * rate
@@ -0,0 +1,5 @@
+from dates import days_in_weeks
+
+
+def test_days_in_weeks():
+    assert days_in_weeks(2) == 14
@@ -0,0 +1,5 @@
+from money import add_tax
+
+
+def test_add_tax():
+    assert add_tax(100, 0.25) == 125
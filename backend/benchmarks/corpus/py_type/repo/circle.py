@@ -0,0 +1,2 @@
+def circle_area(radius):
+    return "3.14" * radius * radius
@@ -0,0 +1,5 @@
+from circle import circle_area
+
+
+def test_circle_area():
+    assert round(circle_area(2), 2) == 12.56
@@ -0,0 +1,158 @@
+"""
+A local stand-in for the GitHub REST API and git hosting, for exercising GitOps offline.
+
+Serves the handful of endpoints github_push_node uses, backs every repo with a bare git
+repository under `git_root` (point GITHUB_GIT_URL at file://<git_root>), and can simulate
+slow fork provisioning and rate limiting.
+
+    python -m benchmarks.fake_github --port 8765 --git-root /tmp/fake-github --repo judges/calc
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGIN = "healing-bot"
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, git_root: str, fork_delay: float = 0.0, rate_limit_every: int = 0, latency: float = 0.0):
+        super().__init__(address, FakeGitHubHandler)
+        self.git_root = git_root
+        self.fork_delay = fork_delay              # seconds before a new fork answers /commits with 200
+        self.rate_limit_every = rate_limit_every  # every Nth request gets a 429 with Retry-After (0 = never)
+        self.latency = latency                    # added to every response
+        self.repos = {}                           # "owner/name" -> {"default_branch", "ready_at"}
+        self.pulls = set()
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "connections": 0, "rate_limited": 0, "forks": 0, "pulls": 0}
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def add_repo(self, owner: str, name: str, default_branch: str = "main") -> str:
+        """Registers an upstream repo and returns the path of its (empty) bare git repository."""
+        path = os.path.join(self.git_root, owner, f"{name}.git")
+        if not os.path.isdir(path):
+            subprocess.run(["git", "init", "-q", "--bare", "-b", default_branch, path], check=True)
+        with self.lock:
+            self.repos[f"{owner}/{name}"] = {"default_branch": default_branch, "ready_at": 0.0}
+        return path
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse shows up in stats
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers=None):
+        payload = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _begin(self) -> bool:
+        """Counts the request, applies latency and rate limiting. False if the request was already answered."""
+        length = int(self.headers.get("Content-Length", "0"))
+        self.body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            limited = server.rate_limit_every and server.stats["requests"] % server.rate_limit_every == 0
+            if limited:
+                server.stats["rate_limited"] += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if limited:
+            self._send(429, {"message": "API rate limit exceeded"}, {"Retry-After": "0", "X-RateLimit-Remaining": "0"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._begin():
+            return
+        path = self.path.split("?")[0]
+        if path == "/user":
+            return self._send(200, {"login": LOGIN})
+        match = re.fullmatch(r"/repos/([^/]+)/([^/]+)(/commits)?", path)
+        repo = self.server.repos.get(f"{match.group(1)}/{match.group(2)}") if match else None
+        if repo is None:
+            return self._send(404, {"message": "Not Found"})
+        if match.group(3):
+            if time.time() < repo["ready_at"]:
+                return self._send(409, {"message": "Git Repository is empty."})
+            return self._send(200, [])
+        return self._send(200, {"name": match.group(2), "owner": {"login": match.group(1)}, "default_branch": repo["default_branch"]})
+
+    def do_POST(self):
+        if not self._begin():
+            return
+        server = self.server
+        match = re.fullmatch(r"/repos/([^/]+)/([^/]+)/(forks|pulls)", self.path.split("?")[0])
+        upstream = server.repos.get(f"{match.group(1)}/{match.group(2)}") if match else None
+        if upstream is None:
+            return self._send(404, {"message": "Not Found"})
+        owner, name, action = match.groups()
+
+        if action == "forks":
+            fork_path = os.path.join(server.git_root, LOGIN, f"{name}.git")
+            with server.lock:
+                is_new = f"{LOGIN}/{name}" not in server.repos
+                if is_new:
+                    server.repos[f"{LOGIN}/{name}"] = {"default_branch": upstream["default_branch"], "ready_at": time.time() + server.fork_delay}
+                    server.stats["forks"] += 1
+            if is_new and not os.path.isdir(fork_path):
+                upstream_path = os.path.join(server.git_root, owner, f"{name}.git")
+                subprocess.run(["git", "clone", "-q", "--bare", upstream_path, fork_path], check=True, capture_output=True)
+            return self._send(202, {"name": name, "owner": {"login": LOGIN}})
+
+        key = (owner, name, self.body.get("head"), self.body.get("base"))
+        with server.lock:
+            duplicate = key in server.pulls
+            server.pulls.add(key)
+            if not duplicate:
+                server.stats["pulls"] += 1
+        if duplicate:
+            return self._send(422, {"message": "A pull request already exists."})
+        return self._send(201, {"html_url": f"{server.api_url}/{owner}/{name}/pull/{len(server.pulls)}"})
+
+
+def start_fake_github(git_root: str, port: int = 0, **options) -> FakeGitHub:
+    """Starts the server on a background thread and returns it (call .shutdown() when done)."""
+    os.makedirs(git_root, exist_ok=True)
+    server = FakeGitHub(("127.0.0.1", port), git_root, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake GitHub API for offline GitOps runs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--git-root", default="/tmp/fake-github")
+    parser.add_argument("--fork-delay", type=float, default=2.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--repo", action="append", default=[], help="upstream repo to create, as owner/name")
+    args = parser.parse_args()
+    os.makedirs(args.git_root, exist_ok=True)
+    server = FakeGitHub(("127.0.0.1", args.port), args.git_root, args.fork_delay, args.rate_limit_every)
+    for full_name in args.repo:
+        print(f"📁 {full_name}: {server.add_repo(*full_name.split('/', 1))}")
+    print(f"🐙 Fake GitHub on {server.api_url} (GITHUB_GIT_URL=file://{os.path.abspath(args.git_root)})")
+    server.serve_forever()
@@ -0,0 +1,87 @@
+"""
+A scripted, deterministic stand-in for the Gemini client in agents/llm_config.py.
+
+It recognizes which Minister is calling from the system prompt and answers from the case's
+script (see corpus/*/case.json), after an optional fake latency, either whole or streamed in chunks. Token usage is estimated at
+4 characters per token so the benchmark can still report it.
+"""
+import json
+import re
+import threading
+import time
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from agents import ministers
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_CHARS = 32
+
+
+class FakeLLM:
+    model = "fake-llm"
+
+    def __init__(self, script: dict, latency: float = 0.0):
+        self.script = script
+        self.latency = latency
+        self.calls = {}
+        self.repairs_per_file = {}
+        self._lock = threading.Lock()
+
+    def _count(self, minister: str, counts: dict = None) -> int:
+        counts = self.calls if counts is None else counts
+        with self._lock:
+            counts[minister] = counts.get(minister, 0) + 1
+            return counts[minister] - 1
+
+    def _repair(self, rewrite: bool, prompt: str) -> str:
+        repairs = self.script["repairs"]
+        count = self._count("repair")
+        if isinstance(repairs, dict):
+            # Multi-file cases script the repairs per file; the prompt says which file is being fixed
+            location = re.search(r'Location: (\S+)', prompt)
+            file = location.group(1) if location and location.group(1) in repairs else next(iter(repairs))
+            repairs, count = repairs[file], self._count(file, self.repairs_per_file)
+        repair = repairs[min(count, len(repairs) - 1)]
+        if rewrite:
+            # Only reached when a patch was rejected; echo the replacement as the rewritten span
+            return f"COMMIT: {repair['commit']}\n```python\n{repair['replace']}\n```"
+        return f"COMMIT: {repair['commit']}\n<<<<<<< SEARCH\n{repair['search']}\n=======\n{repair['replace']}\n>>>>>>> REPLACE"
+
+    def _answer(self, system_prompt: str, prompt: str) -> str:
+        if system_prompt == ministers.CLASSIFIER_PROMPT:
+            self._count("classification")
+            return self.script["bug_type"]
+        if system_prompt == ministers.LOCALIZER_PROMPT:
+            self._count("localization")
+            return json.dumps({"file": self.script["file"], "line": self.script["line"]})
+        if system_prompt == ministers.PATCH_REPAIR_PROMPT:
+            return self._repair(rewrite=False, prompt=prompt)
+        if system_prompt in (ministers.REPAIR_PROMPT, ministers.SCOPED_REPAIR_PROMPT):
+            return self._repair(rewrite=True, prompt=prompt)
+        self._count("qa")
+        return "```python\nimport unittest\n```"
+
+    @staticmethod
+    def _usage(messages, content: str) -> dict:
+        prompt_chars = sum(len(message.content) for message in messages)
+        return {
+            "input_tokens": prompt_chars // CHARS_PER_TOKEN,
+            "output_tokens": len(content) // CHARS_PER_TOKEN,
+            "total_tokens": (prompt_chars + len(content)) // CHARS_PER_TOKEN,
+        }
+
+    def invoke(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        content = self._answer(messages[0].content, messages[-1].content)
+        return AIMessage(content=content, usage_metadata=self._usage(messages, content))
+
+    def stream(self, messages):
+        """The same answer in chunks; the latency is paid before the first one, usage rides on the last."""
+        if self.latency:
+            time.sleep(self.latency)
+        content = self._answer(messages[0].content, messages[-1].content)
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            yield AIMessageChunk(content=piece, usage_metadata=self._usage(messages, content) if last else None)
@@ -0,0 +1,202 @@
+"""
+Offline end-to-end benchmark: every corpus case goes through agent_workflow_generator (clone ->
+initial tests -> healing_agent -> score) with the scripted FakeLLM instead of Gemini.
+
+Reports p50/p95 wall time per phase, iterations to green, sandbox boots and tokens, and can
+compare against a stored baseline to catch regressions. No baseline ships with the repo:
+record one on the machine that will run the comparisons.
+
+    python -m benchmarks.run_benchmarks --repeats 3
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json     # exit code 1 on regression
+    python -m benchmarks.run_benchmarks --fix-memory    # repeats 2..N replay remembered fixes
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+SANDBOX_RUN_PHASES = {"tests", "cold_run", "local_run"}
+# Timing differences below this are noise, whatever the relative change.
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def load_cases(selected: list) -> dict:
+    cases = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if selected and name not in selected:
+            continue
+        with open(os.path.join(CORPUS_DIR, name, "case.json"), "r", encoding="utf-8") as f:
+            cases[name] = json.load(f)
+    return cases
+
+
+def make_upstream(name: str, workdir: str) -> str:
+    """Copies a case into a throwaway git repo and returns its file:// URL."""
+    path = os.path.join(workdir, "upstream", name)
+    shutil.copytree(os.path.join(CORPUS_DIR, name, "repo"), path)
+    for args in (["init", "-q", "-b", "main"], ["add", "."], ["commit", "-qm", "broken"]):
+        subprocess.run(
+            ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com"] + args,
+            cwd=path, check=True, capture_output=True
+        )
+    return f"file://{path}"
+
+
+async def run_case(main, llm_config, fake_llm_cls, name: str, script: dict, repo_url: str, latency: float) -> dict:
+    llm = fake_llm_cls(script, latency=latency)
+    llm_config.llm = llm
+    request = main.RunRequest(repoUrl=repo_url, teamName="Bench", leaderName=name)
+
+    spans, green, score = [], False, {}
+    started = time.perf_counter()
+    async for event in main.agent_workflow_generator(str(uuid.uuid4()), request):
+        if event["event"] == "timing":
+            spans.append(json.loads(event["data"]))
+        elif event["event"] == "log" and "Tests Passed" in event["data"]:
+            green = True  # not `fix` events: a batch can confirm some fixes while other files still fail
+        elif event["event"] == "score":
+            score = json.loads(event["data"])
+    wall = time.perf_counter() - started
+
+    phases = {}
+    for span in spans:
+        key = f"{span['span']}:{span['name']}"
+        phases[key] = phases.get(key, 0.0) + span["seconds"]
+    return {
+        "case": name,
+        "green": green,
+        "wall": wall,
+        "phases": phases,
+        "iterations": sum(1 for s in spans if s["span"] == "node" and s["name"] in ("Repair", "SpeculativeRepair")),
+        "sandbox_boots": sum(1 for s in spans if s["span"] == "sandbox" and s["name"] in SANDBOX_RUN_PHASES),
+        "prompt_tokens": sum(s.get("prompt_tokens", 0) for s in spans if s["span"] == "llm"),
+        "completion_tokens": sum(s.get("completion_tokens", 0) for s in spans if s["span"] == "llm"),
+        "llm_calls": sum(llm.calls.values()),
+        "score": score.get("total"),
+    }
+
+
+def summarize(runs: list) -> dict:
+    phase_values = {}
+    for run in runs:
+        for key, seconds in run["phases"].items():
+            phase_values.setdefault(key, []).append(seconds)
+    walls = [run["wall"] for run in runs]
+    return {
+        "runs": len(runs),
+        "green_rate": round(sum(run["green"] for run in runs) / len(runs), 3),
+        "wall": {"p50": round(percentile(walls, 0.5), 3), "p95": round(percentile(walls, 0.95), 3)},
+        "phases": {
+            key: {"p50": round(percentile(values, 0.5), 3), "p95": round(percentile(values, 0.95), 3)}
+            for key, values in sorted(phase_values.items())
+        },
+        # Deterministic with the scripted LLM, so any change is a behaviour change, not noise
+        "per_case": {
+            run["case"]: {key: run[key] for key in ("green", "iterations", "sandbox_boots", "prompt_tokens", "completion_tokens", "llm_calls")}
+            for run in runs
+        },
+    }
+
+
+def print_report(summary: dict):
+    print(f"\n📊 {summary['runs']} runs, {summary['green_rate']:.0%} green, wall p50 {summary['wall']['p50']}s / p95 {summary['wall']['p95']}s")
+    print(f"\n{'phase':<32}{'p50 (s)':>10}{'p95 (s)':>10}")
+    for key, stats in summary["phases"].items():
+        print(f"{key:<32}{stats['p50']:>10.3f}{stats['p95']:>10.3f}")
+    print(f"\n{'case':<18}{'green':>7}{'iters':>7}{'boots':>7}{'prompt tok':>12}{'compl tok':>11}{'llm calls':>11}")
+    for case, stats in summary["per_case"].items():
+        print(f"{case:<18}{str(stats['green']):>7}{stats['iterations']:>7}{stats['sandbox_boots']:>7}"
+              f"{stats['prompt_tokens']:>12}{stats['completion_tokens']:>11}{stats['llm_calls']:>11}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions versus the baseline (empty list = no regression)."""
+    regressions = []
+    timed = {"wall": (summary["wall"], baseline.get("wall", {}))}
+    timed.update({key: (stats, baseline.get("phases", {}).get(key, {})) for key, stats in summary["phases"].items()})
+    for key, (current, previous) in timed.items():
+        for stat in ("p50", "p95"):
+            if stat in previous and current[stat] > previous[stat] * (1 + tolerance) and current[stat] - previous[stat] > NOISE_FLOOR_SECONDS:
+                regressions.append(f"{key} {stat}: {previous[stat]}s -> {current[stat]}s")
+    for case, current in summary["per_case"].items():
+        previous = baseline.get("per_case", {}).get(case)
+        if not previous:
+            continue
+        if previous["green"] and not current["green"]:
+            regressions.append(f"{case}: no longer goes green")
+        for key in ("iterations", "sandbox_boots", "prompt_tokens", "completion_tokens", "llm_calls"):
+            if current[key] > previous[key]:
+                regressions.append(f"{case} {key}: {previous[key]} -> {current[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the healing pipeline")
+    parser.add_argument("--cases", nargs="*", default=[], help="corpus case names (default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per case; the first one has a cold clone")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per call, seconds")
+    parser.add_argument("--sandbox", choices=("local", "docker"), default="local")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before a timing counts as a regression")
+    parser.add_argument("--save-baseline", help="write this run's summary as the new baseline")
+    parser.add_argument("--fix-memory", action="store_true",
+                        help="keep the fix memory on, so repeats after the first reuse its fixes instead of calling the LLM")
+    args = parser.parse_args()
+
+    # Everything below reads its configuration at import time
+    workdir = tempfile.mkdtemp(prefix="healing-bench-")
+    os.environ["SANDBOX_BACKEND"] = args.sandbox
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["FIX_MEMORY_ENABLED"] = "1" if args.fix_memory else "0"
+    os.environ["HEALING_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["CLONE_ROOT"] = os.path.join(workdir, "clones")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ.pop("GITHUB_TOKEN", None)  # GitOps stops at the token check instead of calling GitHub
+    import main as app_main
+    from agents import llm_config
+    from benchmarks.fake_llm import FakeLLM
+
+    cases = load_cases(args.cases)
+    urls = {name: make_upstream(name, workdir) for name in cases}
+    runs = []
+    for repeat in range(args.repeats):
+        for name, script in cases.items():
+            runs.append(asyncio.run(run_case(app_main, llm_config, FakeLLM, name, script, urls[name], args.latency)))
+
+    summary = summarize(runs)
+    print_report(summary)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n💾 Baseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Separate caps for whole runs, docker sandboxes and in-flight LLM calls.
+# Sandboxes and LLM calls happen inside graph nodes (worker threads), hence threading primitives.
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "8"))
+MAX_CONCURRENT_SANDBOXES = int(os.getenv("MAX_CONCURRENT_SANDBOXES", "4"))
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4"))
+
+
+class Slots:
+    """A bounded semaphore that also reports how many holders and waiters it has."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            self.waiting += 1
+        self._semaphore.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "in_use": self.in_use, "waiting": self.waiting}
+
+
+sandbox_slots = Slots("sandbox", MAX_CONCURRENT_SANDBOXES)
+llm_slots = Slots("llm", MAX_CONCURRENT_LLM_CALLS)
@@ -0,0 +1,190 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrency import sandbox_slots
+from sandbox_pool import container_pool
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+DEPS_CACHE_MAX_BYTES = int(os.getenv("DEPS_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))  # 10 GB
+DEPS_IMAGE_REPO = "healing-deps"
+BUILD_TIMEOUT = int(os.getenv("DEPS_BUILD_TIMEOUT", "600"))
+
+INDEX_PATH = os.path.join(CACHE_DIR, "deps_index.json")
+
+# Which files decide the dependency tree for each base image.
+MANIFESTS = {
+    "python:3.11-slim": ["requirements.txt"],
+    "node:18-alpine": ["package.json", "package-lock.json"],
+}
+
+DOCKERFILES = {
+    "python:3.11-slim": """FROM python:3.11-slim
+COPY requirements.txt /deps/requirements.txt
+RUN pip install --no-cache-dir -q -r /deps/requirements.txt
+""",
+    "node:18-alpine": """FROM node:18-alpine
+WORKDIR /deps
+COPY package*.json ./
+RUN if [ -f package-lock.json ]; then npm ci --no-audit --no-fund; else npm install --no-audit --no-fund; fi
+ENV NODE_PATH=/deps/node_modules
+ENV PATH=/deps/node_modules/.bin:$PATH
+""",
+}
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_failed_builds = set()  # hashes that failed to build this process; don't retry them every iteration
+
+stats = {"hits": 0, "misses": 0, "build_failures": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(counter: str):
+    with _stats_lock:
+        stats[counter] += 1
+
+
+def manifest_hash(repo_path: str, base_image: str):
+    """Content hash of the dependency manifests plus the base image, or None if there is nothing to install."""
+    names = MANIFESTS.get(base_image, [])
+    digest = hashlib.sha256(base_image.encode())
+    found = False
+    for name in names:
+        path = os.path.join(repo_path, name)
+        if os.path.exists(path):
+            found = True
+            digest.update(name.encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:24] if found else None
+
+
+@contextmanager
+def _index_lock():
+    """Cross-process lock around the on-disk LRU index."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(INDEX_PATH + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_index() -> dict:
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(index: dict):
+    tmp_path = INDEX_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+def _image_size(tag: str):
+    try:
+        result = subprocess.run(
+            ["docker", "image", "inspect", "-f", "{{.Size}}", tag],
+            capture_output=True, text=True, timeout=30
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    return int(result.stdout.strip()) if result.returncode == 0 else None
+
+
+def _build_image(repo_path: str, base_image: str, tag: str) -> bool:
+    print(f"📦 DEPS CACHE: Building dependency layer {tag}...")
+    with tempfile.TemporaryDirectory(prefix="healing-deps-") as context:
+        for name in MANIFESTS[base_image]:
+            src = os.path.join(repo_path, name)
+            if os.path.exists(src):
+                shutil.copy(src, os.path.join(context, name))
+        with open(os.path.join(context, "Dockerfile"), "w", encoding="utf-8") as f:
+            f.write(DOCKERFILES[base_image])
+        try:
+            result = subprocess.run(
+                ["docker", "build", "-q", "-t", tag, context],
+                capture_output=True, text=True, timeout=BUILD_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            print(f"⏳ DEPS CACHE: Build of {tag} timed out.")
+            return False
+        except OSError as e:
+            print(f"❌ DEPS CACHE: Docker unavailable: {e}")
+            return False
+    if result.returncode != 0:
+        print(f"❌ DEPS CACHE: Build of {tag} failed: {result.stderr[-500:]}")
+        return False
+    return True
+
+
+def _evict(index: dict, keep: str):
+    """Drops least-recently-used images until the cache fits in DEPS_CACHE_MAX_BYTES."""
+    total = sum(entry["size"] for entry in index.values())
+    for tag, _ in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+        if total <= DEPS_CACHE_MAX_BYTES:
+            break
+        if tag == keep:
+            continue
+        print(f"🧹 DEPS CACHE: Evicting {tag}")
+        container_pool.drop_image(tag)
+        subprocess.run(["docker", "rmi", "-f", tag], capture_output=True)
+        total -= index.pop(tag)["size"]
+        _count("evictions")
+
+
+def get_dependency_image(repo_path: str, base_image: str):
+    """
+    Returns a derived image with the repo's dependencies pre-installed, building it on a miss.
+    Returns None when the repo has no manifest or the build failed, so callers install inline.
+    """
+    if base_image not in DOCKERFILES:
+        return None
+    key = manifest_hash(repo_path, base_image)
+    if key is None or key in _failed_builds:
+        return None
+    tag = f"{DEPS_IMAGE_REPO}:{key}"
+
+    with _key_locks_guard:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    # One build per manifest hash, even with several concurrent runs on the same repo.
+    with key_lock:
+        with _index_lock():
+            index = _load_index()
+            cached = tag in index and _image_size(tag) is not None
+            if cached:
+                index[tag]["last_used"] = time.time()
+                _save_index(index)
+        if cached:
+            _count("hits")
+            print(f"📦 DEPS CACHE: Hit {tag}")
+            return tag
+
+        _count("misses")
+        # A build is as heavy as a test run (npm ci / pip install), so it takes a sandbox slot too
+        with sandbox_slots.acquire():
+            built = _build_image(repo_path, base_image, tag)
+        if not built:
+            _count("build_failures")
+            _failed_builds.add(key)
+            return None
+
+        with _index_lock():
+            index = _load_index()
+            index[tag] = {"size": _image_size(tag) or 0, "last_used": time.time(), "base": base_image}
+            _evict(index, keep=tag)
+            _save_index(index)
+    return tag
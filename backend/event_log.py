@@ -0,0 +1,65 @@
+import asyncio
+import itertools
+from collections import deque
+
+
+class RunEventLog:
+    """
+    Append-only ring buffer of one run's SSE events, with monotonically increasing sequence IDs.
+    Every subscriber reads the same buffer with its own cursor, so fan-out costs no extra memory
+    and a slow consumer just falls behind (and skips ahead) instead of making the run wait.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._buffer = deque(maxlen=capacity)
+        self._next_id = 1
+        self._wakeup = asyncio.Event()
+        self.closed = False
+        self.subscribers = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def append(self, event: dict) -> int:
+        event_id = self._next_id
+        self._next_id += 1
+        self._buffer.append({**event, "id": str(event_id)})
+        self._notify()
+        return event_id
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event, then arm a fresh one for the next append.
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def subscribe(self, last_event_id: int = 0):
+        """Yields every event after `last_event_id` (replay), then live events until the run is closed."""
+        # An ID this log never issued comes from a stream of the same run before a restart: replay everything
+        cursor = last_event_id if last_event_id <= self.last_id else 0
+        self.subscribers += 1
+        try:
+            while True:
+                wakeup = self._wakeup
+                first_id = self._next_id - len(self._buffer)
+                if cursor < first_id - 1:
+                    # The ring wrapped past this subscriber; tell the client and resume from the oldest kept event.
+                    yield {"event": "log", "data": f"⚠️ {first_id - 1 - cursor} older events were dropped from the buffer."}
+                    cursor = first_id - 1
+
+                pending = list(itertools.islice(self._buffer, cursor - first_id + 1, None))
+                for event in pending:
+                    yield event
+                    cursor = int(event["id"])
+
+                if pending:
+                    continue
+                if self.closed:
+                    return
+                await wakeup.wait()
+        finally:
+            self.subscribers -= 1
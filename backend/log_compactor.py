@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+RAW_LOG_DIR = os.path.join(CACHE_DIR, "raw-logs")
+RAW_LOG_TTL_SECONDS = int(os.getenv("RAW_LOG_TTL_SECONDS", str(24 * 3600)))
+
+LOG_HEAD_LINES = int(os.getenv("LOG_HEAD_LINES", "20"))     # kept from the start of each failure
+LOG_TAIL_LINES = int(os.getenv("LOG_TAIL_LINES", "30"))     # kept from the end of each failure (innermost frames)
+LOG_TOKEN_BUDGET = int(os.getenv("LOG_TOKEN_BUDGET", "4000"))
+CHARS_PER_TOKEN = 4
+
+# pip / npm chatter, progress output, `unittest -v` lines of passing tests and report-file notices: none of it helps locate a bug
+NOISE_RE = re.compile(
+    r'^\s*(?:'
+    r'Collecting |Downloading |Using cached |Obtaining |Requirement already satisfied|Installing collected packages'
+    r'|Successfully installed|Successfully built|Building wheels? for|Created wheel for|Stored in directory'
+    r'|Preparing metadata|Getting requirements to build|Installing build dependencies'
+    r'|WARNING: Running pip as|\[notice\]|[━─╸\s]+[\d.]+/[\d.]+ [kMG]?B'
+    r'|npm (?:WARN|notice|info|http)|added \d+ packages?|removed \d+ packages?|changed \d+ packages?'
+    r'|up to date|audited \d+ packages?|found \d+ vulnerabilit|\d+ packages? (?:is|are) looking for funding'
+    r'|run `npm fund`|run `npm audit'
+    r'|\w+ \([\w.]+\) \.\.\. (?:ok|skipped\b.*|expected failure)$'
+    r'|-+ generated xml file: '
+    r')'
+)
+# Lines that must survive truncation: they are what the router / failing-test-first logic read.
+KEEP_RE = re.compile(r'^(?:FAILED|ERROR)\s|^=+ .* =+\s*$|^(?:FAIL|ERROR):\s|^Ran \d+ tests?|^(?:OK|FAILED)\b')
+# Where a new failure starts: a plain traceback, or a pytest/unittest section header.
+BLOCK_START_RE = re.compile(r'^\s*Traceback \(most recent call last\):|^(?:_{3,}|={3,}) .+ (?:_{3,}|={3,})\s*$|^={20,}\s*$')
+WARNINGS_SECTION_RE = re.compile(r'^=+ warnings summary =+\s*$')
+SECTION_HEADER_RE = re.compile(r'^=+ .+ =+\s*$')
+ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+
+
+class LogCompactor:
+    """
+    Streaming log compaction: feed lines as they arrive, call finish() for the result.
+    Drops install noise and warning summaries, collapses identical failure blocks and keeps
+    only the head and tail of long ones, then trims the whole thing to a token budget.
+    """
+
+    def __init__(self, head: int = LOG_HEAD_LINES, tail: int = LOG_TAIL_LINES, token_budget: int = LOG_TOKEN_BUDGET):
+        self.head = head
+        self.tail = tail
+        self.token_budget = token_budget
+        self._output = []
+        self._block = []
+        self._seen_blocks = {}
+        self._in_warnings = False
+        self.raw_bytes = 0
+        self.noise_lines = 0
+        self.duplicate_blocks = 0
+        self.truncated_lines = 0
+
+    def feed(self, line: str):
+        line = line.rstrip("\r\n")
+        self.raw_bytes += len(line.encode()) + 1
+
+        if WARNINGS_SECTION_RE.match(line):
+            self._in_warnings = True
+            self.noise_lines += 1
+            return
+        if self._in_warnings:
+            if not SECTION_HEADER_RE.match(line):
+                self.noise_lines += 1
+                return
+            self._in_warnings = False
+
+        if NOISE_RE.match(line):
+            self.noise_lines += 1
+            return
+        if BLOCK_START_RE.match(line):
+            self._flush_block()
+        self._block.append(line)
+
+    def _flush_block(self):
+        block, self._block = self._block, []
+        if not block:
+            return
+
+        # Ignore the header line: the same traceback under a different test name is still a duplicate
+        fingerprint = hashlib.sha1(ADDRESS_RE.sub("0x", "\n".join(block[1:])).encode()).hexdigest()
+        if len(block) > 3 and fingerprint in self._seen_blocks:
+            self.duplicate_blocks += 1
+            # Keep the header (test name) so we still know which test repeated it
+            self._output.append(block[0])
+            self._output.append(f"[... identical to failure #{self._seen_blocks[fingerprint]} above, {len(block) - 1} lines omitted ...]")
+            return
+        self._seen_blocks.setdefault(fingerprint, len(self._seen_blocks) + 1)
+
+        if len(block) <= self.head + self.tail:
+            self._output.extend(block)
+            return
+        middle = block[self.head:len(block) - self.tail]
+        kept_middle = [line for line in middle if KEEP_RE.match(line)]
+        self.truncated_lines += len(middle) - len(kept_middle)
+        self._output.extend(block[:self.head])
+        self._output.append(f"[... {len(middle) - len(kept_middle)} lines omitted ...]")
+        self._output.extend(kept_middle)
+        self._output.extend(block[len(block) - self.tail:])
+
+    def finish(self):
+        """Returns (compacted_text, stats)."""
+        self._flush_block()
+        text = "\n".join(self._output).strip("\n")
+
+        budget_chars = self.token_budget * CHARS_PER_TOKEN
+        if len(text) > budget_chars:
+            # The first failure and the final summary matter most; cut from the middle.
+            head_chars = int(budget_chars * 0.6)
+            tail_chars = budget_chars - head_chars
+            omitted = len(text) - head_chars - tail_chars
+            text = f"{text[:head_chars]}\n[... {omitted} characters omitted to fit the token budget ...]\n{text[-tail_chars:]}"
+
+        compact_bytes = len(text.encode())
+        stats = {
+            "raw_bytes": self.raw_bytes,
+            "compact_bytes": compact_bytes,
+            "compression_ratio": round(self.raw_bytes / compact_bytes, 2) if compact_bytes else 0.0,
+            "noise_lines_dropped": self.noise_lines,
+            "duplicate_blocks": self.duplicate_blocks,
+            "truncated_lines": self.truncated_lines,
+            "estimated_tokens": compact_bytes // CHARS_PER_TOKEN,
+        }
+        return text, stats
+
+
+def compact_log(raw_log: str):
+    """Convenience wrapper for a log that is already fully in memory."""
+    compactor = LogCompactor()
+    for line in raw_log.splitlines():
+        compactor.feed(line)
+    return compactor.finish()
+
+
+# --- 🗄️ Raw log storage (the UI gets the full output, the LLM only the compacted one) ---
+
+def save_raw_log(raw_log: str) -> str:
+    """Stores the full sandbox output on disk and returns its id."""
+    os.makedirs(RAW_LOG_DIR, exist_ok=True)
+    _expire_raw_logs()
+    log_id = uuid.uuid4().hex
+    with open(os.path.join(RAW_LOG_DIR, f"{log_id}.log"), "w", encoding="utf-8") as f:
+        f.write(raw_log)
+    return log_id
+
+
+def raw_log_path(log_id: str):
+    """Path of a stored raw log, or None for unknown / malformed ids."""
+    if not re.fullmatch(r'[0-9a-f]{32}', log_id or ""):
+        return None
+    path = os.path.join(RAW_LOG_DIR, f"{log_id}.log")
+    return path if os.path.exists(path) else None
+
+
+def _expire_raw_logs():
+    cutoff = time.time() - RAW_LOG_TTL_SECONDS
+    for name in os.listdir(RAW_LOG_DIR):
+        path = os.path.join(RAW_LOG_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
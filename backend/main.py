@@ -1,154 +1,392 @@
-import asyncio
-import json
-import uuid
-from datetime import datetime
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sse_starlette.sse import EventSourceResponse
-
-# Docker-only imports now!
-from sandbox import run_tests_in_docker, clone_repository 
-from agents.graph import healing_agent
-from agents.graph_state import AgentState
-
-app = FastAPI(title="The Healing Agent Orchestrator")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], 
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-class RunRequest(BaseModel):
-    repoUrl: str
-    teamName: str
-    leaderName: str
-
-active_runs = {}
-
-def generate_branch_name(team: str, leader: str) -> str:
-    # Rule: All UPPERCASE, Replace spaces with underscores, End with _AI_Fix
-    team_clean = team.strip().replace(" ", "_").upper()
-    leader_clean = leader.strip().replace(" ", "_").upper()
-    return f"{team_clean}_{leader_clean}_AI_Fix"
-
-async def agent_workflow_generator(run_id: str, request: RunRequest):
-    """The main bridge between React, Docker Sandbox, and AI."""
-    start_time = datetime.now()
-    branch_name = generate_branch_name(request.teamName, request.leaderName)
-
-    yield {"event": "status", "data": "RUNNING"}
-    
-    # --- 1. CLONE THE REPOSITORY ---
-    yield {"event": "step", "data": "1"}
-    yield {"event": "log", "data": f"Initializing Minister of Intelligence... Cloning {request.repoUrl}"}
-    
-    repo_path = clone_repository(request.repoUrl)
-    if not repo_path:
-        yield {"event": "log", "data": "❌ Failed to clone repository. Check URL."}
-        yield {"event": "status", "data": "FAILED"}
-        return
-
-    # --- 2. RUN INITIAL TESTS (DOCKER ONLY) ---
-    yield {"event": "step", "data": "2"}
-    yield {"event": "log", "data": "Booting Docker to run initial Sandbox Tests..."}
-    
-    initial_test = run_tests_in_docker(repo_path)
-    
-    if initial_test["passed"]:
-        yield {"event": "log", "data": "✅ All tests passed! No bugs found."}
-        yield {"event": "status", "data": "PASSED"}
-        return
-        
-    yield {"event": "log", "data": "❌ Failures Detected! Capturing logs and waking AI..."}
-    await asyncio.sleep(1)
-
-    # --- 3. WAKE UP THE AI CABINET ---
-    yield {"event": "step", "data": "3"}
-    
-    initial_state: AgentState = {
-        "error_message": initial_test["error_logs"],
-        "repo_url": request.repoUrl,
-        "repo_path": repo_path, 
-        "branch_name": branch_name, # Pass branch name into the graph state for GitOps!
-        "file_content": "", "target_file": "", "bug_type": "", "target_line": 0, 
-        "proposed_fix": "", "format_attempts": 0, "retry_count": 0, 
-        "fixes_applied": [], "run_status": "", "test_generated": False
-    }
-
-    # Stream the graph execution
-    for output in healing_agent.stream(initial_state):
-        for node_name, state_update in output.items():
-            
-            if node_name == "Classifier":
-                yield {"event": "log", "data": f"🔍 Bug Classified: {state_update.get('bug_type')}"}
-                
-            elif node_name == "Localizer":
-                yield {"event": "log", "data": f"📍 Pinpointed to {state_update.get('target_file')} (Line {state_update.get('target_line')})"}
-                
-            elif node_name == "Repair":
-                yield {"event": "step", "data": "4"}
-                yield {"event": "log", "data": "🔨 Forging new code fix..."}
-                
-            elif node_name == "Validator":
-                status = state_update.get('run_status')
-                yield {"event": "log", "data": f"⚖️ Validation Status: {status}"}
-                    
-            elif node_name == "Sandbox":
-                sandbox_status = state_update.get('run_status')
-                
-                if sandbox_status == "TESTS_PASSED":
-                    yield {"event": "log", "data": "✅ Execution Environment: Tests Passed!"}
-                    
-                    # 🟢 UI turns green here!
-                    fixes = state_update.get("fixes_applied", [])
-                    if fixes:
-                        final_fix = fixes[-1]
-                        final_fix["status"] = "SUCCESS" 
-                        yield {"event": "fix", "data": json.dumps(final_fix)}
-                        
-                else:
-                    yield {"event": "log", "data": "❌ Execution Environment: Tests Failed! Looping back to AI..."}
-                    await asyncio.sleep(2) 
-                    
-            elif node_name == "GitOps":
-                git_status = state_update.get('run_status')
-                if git_status == "PUSHED_TO_GITHUB":
-                    yield {"event": "log", "data": f"🚀 Successfully pushed branch {branch_name} to GitHub!"}
-                else:
-                    yield {"event": "log", "data": f"⚠️ Git Push Failed: {git_status} (Check repo permissions)"}
-        
-        # Prevent API Rate Limits
-        await asyncio.sleep(2)
-
-    # --- 4. FINISH & SCORE ---
-    yield {"event": "step", "data": "5"}
-    yield {"event": "log", "data": "Run Complete! Generating final score..."}
-    
-    time_taken = (datetime.now() - start_time).seconds
-    mock_score = {
-        "base": 100,
-        "speedBonus": 10 if time_taken < 300 else 0, # < 5 mins gets bonus
-        "efficiencyPenalty": 0,
-        "total": 110 if time_taken < 300 else 100
-    }
-    
-    yield {"event": "score", "data": json.dumps(mock_score)}
-    yield {"event": "status", "data": "PASSED"}
-
-
-@app.post("/api/run-agent")
-async def start_agent_run(req: RunRequest):
-    run_id = str(uuid.uuid4())
-    active_runs[run_id] = req
-    return {"run_id": run_id, "branch": generate_branch_name(req.teamName, req.leaderName)}
-
-@app.get("/api/stream/{run_id}")
-async def stream_agent_logs(run_id: str):
-    if run_id not in active_runs:
-        return {"error": "Run ID not found"}
-    req = active_runs[run_id]
-    return EventSourceResponse(agent_workflow_generator(run_id, req))
\ No newline at end of file
+import asyncio
+import hmac
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+# Docker-only imports now!
+from sandbox import run_tests_in_docker_async, clone_repository_async, warm_sandbox_pool
+from sandbox_results import compact_report, report_summary
+from sandbox_pool import container_pool
+from sandbox_limits import test_history
+import dep_cache
+from log_compactor import raw_log_path
+from workspace import release_workspaces
+import repo_cache
+import metrics
+from concurrency import sandbox_slots, llm_slots
+from scheduler import RunScheduler, QueueFullError
+from agents.graph import get_healing_agent, compile_healing_agent
+from agents.checkpointing import open_checkpointer, run_journal
+from agents.graph_state import AgentState
+from agents.llm_cache import llm_cache
+from agents.static_checks import static_check_stats
+from agents.fix_memory import fix_memory
+
+# Build the LLM client and compile the graph while the app starts, instead of on the first run.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+# Anyone can call /api/run-agent, so a request may only lower its own priority (background jobs). Raising it
+# above 0 takes this token in the X-Priority-Token header; with no token configured, nobody can.
+PRIORITY_ADMIN_TOKEN = os.getenv("PRIORITY_ADMIN_TOKEN", "")
+
+def warm_up():
+    """Everything the first run would otherwise wait for: LangGraph, the Ministers, the Gemini client and the compiled graph."""
+    from agents.llm_config import get_llm
+
+    started = time.perf_counter()
+    get_llm()
+    current_graph()
+    print(f"🔥 WARM-UP: LLM client and graph ready in {time.perf_counter() - started:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global healing_graph, graph_checkpointer
+    # LangGraph runs our synchronous Ministers on the loop's default executor during astream,
+    # so size it for many concurrent runs instead of the stdlib's min(32, cpu + 4).
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(
+        max_workers=int(os.getenv("GRAPH_WORKER_THREADS", "64")),
+        thread_name_prefix="graph"
+    ))
+    warm_sandbox_pool()
+    async with open_checkpointer() as checkpointer:
+        graph_checkpointer, healing_graph = checkpointer, None
+        if STARTUP_WARMUP:
+            await loop.run_in_executor(None, warm_up)
+        scheduler.start()
+        # Runs the previous process accepted but never finished (crash, redeploy) start again under their old IDs
+        for run_id, request, priority in run_journal.claim_unfinished():
+            print(f"♻️ CHECKPOINTS: Re-queuing run {run_id}")
+            try:
+                scheduler.submit(run_id, RunRequest(**request), priority=priority)
+            except QueueFullError:
+                # Its journal entry stays: the next start tries it again
+                print(f"⚠️ CHECKPOINTS: Queue full, leaving run {run_id} for the next start")
+                run_journal.unclaim(run_id)
+        yield
+        await scheduler.stop()
+        graph_checkpointer, healing_graph = None, None
+    container_pool.shutdown()
+
+app = FastAPI(title="The Healing Agent Orchestrator", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"], 
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+class RunRequest(BaseModel):
+    repoUrl: str
+    teamName: str
+    leaderName: str
+    priority: int = 0
+
+def effective_priority(req: RunRequest, headers) -> int:
+    """The priority the scheduler gets: as asked with the admin token, otherwise capped at the normal 0."""
+    token = headers.get("X-Priority-Token", "")
+    if PRIORITY_ADMIN_TOKEN and hmac.compare_digest(token.encode(), PRIORITY_ADMIN_TOKEN.encode()):
+        return req.priority
+    return min(req.priority, 0)
+
+# The graph runs go through, compiled on first use (or by the warm-up): checkpointed once the app has started.
+healing_graph = None
+graph_checkpointer = None
+
+def current_graph():
+    global healing_graph
+    if healing_graph is None:
+        healing_graph = compile_healing_agent(graph_checkpointer) if graph_checkpointer else get_healing_agent()
+    return healing_graph
+
+def graph_config(run_id: str) -> dict:
+    return {"configurable": {"thread_id": run_id}}
+
+async def resumable_snapshot(run_id: str):
+    """The run's last checkpoint, if it stopped mid-graph and its checkout is still on disk."""
+    if graph_checkpointer is None:
+        return None
+    snapshot = await current_graph().aget_state(graph_config(run_id))
+    if not snapshot.next or not os.path.isdir(snapshot.values.get("repo_path", "")):
+        return None
+    return snapshot
+
+def generate_branch_name(team: str, leader: str) -> str:
+    # Rule: All UPPERCASE, Replace spaces with underscores, End with _AI_Fix
+    team_clean = team.strip().replace(" ", "_").upper()
+    leader_clean = leader.strip().replace(" ", "_").upper()
+    return f"{team_clean}_{leader_clean}_AI_Fix"
+
+def raw_log_events(test_result: dict) -> list:
+    """Link to the full sandbox log plus how much it was compacted before reaching the Ministers."""
+    if not test_result.get("raw_log_id"):
+        return []
+    compaction = test_result.get("compaction", {})
+    return [
+        {"event": "raw_log", "data": json.dumps({"url": f"/api/logs/{test_result['raw_log_id']}", "compaction": compaction})},
+        {"event": "log", "data": f"🗜️ Log compacted {compaction.get('raw_bytes', 0)} B -> {compaction.get('compact_bytes', 0)} B (x{compaction.get('compression_ratio', 0)}) before reaching the AI"},
+    ]
+
+def timing_events(new_timings: list, run_timings: list) -> list:
+    """`timing` SSE events for freshly measured spans (also kept in run_timings for the score)."""
+    run_timings.extend(new_timings)
+    return [{"event": "timing", "data": json.dumps(timing)} for timing in new_timings]
+
+async def agent_workflow_generator(run_id: str, request: RunRequest):
+    """The main bridge between React, Docker Sandbox, and AI."""
+    started = time.perf_counter()
+    timings = []  # every span of the run, for the final score
+    fixes = []
+    branch_name = generate_branch_name(request.teamName, request.leaderName)
+
+    yield {"event": "status", "data": "RUNNING"}
+    
+    # A run the previous process did not finish picks up after its last completed node
+    snapshot = await resumable_snapshot(run_id)
+    if snapshot:
+        repo_path = snapshot.values["repo_path"]
+        # Registered like a fresh checkout, so the mirror it is a worktree of is not evicted under it
+        repo_cache.adopt_checkout(request.repoUrl, repo_path)
+        fixes = snapshot.values.get("fixes_applied", [])
+        graph_input = None
+        yield {"event": "step", "data": "3"}
+        yield {"event": "log", "data": f"♻️ Resuming after a restart, from before {', '.join(snapshot.next)}..."}
+    else:
+        # --- 1. CLONE THE REPOSITORY ---
+        yield {"event": "step", "data": "1"}
+        yield {"event": "log", "data": f"Initializing Minister of Intelligence... Cloning {request.repoUrl}"}
+    
+        with metrics.collect_timings() as clone_timings:
+            repo_path = await clone_repository_async(request.repoUrl)
+        for event in timing_events(clone_timings, timings):
+            yield event
+        if not repo_path:
+            yield {"event": "log", "data": "❌ Failed to clone repository. Check URL."}
+            yield {"event": "status", "data": "FAILED"}
+            return
+
+        # --- 2. RUN INITIAL TESTS (DOCKER ONLY) ---
+        yield {"event": "step", "data": "2"}
+        yield {"event": "log", "data": "Booting Docker to run initial Sandbox Tests..."}
+    
+        with metrics.collect_timings() as test_timings:
+            initial_test = await run_tests_in_docker_async(repo_path)
+        for event in timing_events(test_timings, timings):
+            yield event
+    
+        if initial_test["passed"]:
+            yield {"event": "log", "data": "✅ All tests passed! No bugs found."}
+            yield {"event": "status", "data": "PASSED"}
+            repo_cache.release_checkout(repo_path)
+            return
+        
+        yield {"event": "log", "data": "❌ Failures Detected! Capturing logs and waking AI..."}
+        for event in raw_log_events(initial_test):
+            yield event
+        if initial_test.get("report"):
+            yield {"event": "tests", "data": json.dumps(report_summary(initial_test["report"]))}
+
+        # --- 3. WAKE UP THE AI CABINET ---
+        yield {"event": "step", "data": "3"}
+    
+        initial_state: AgentState = {
+            "error_message": initial_test["error_logs"],
+            "raw_log_id": initial_test.get("raw_log_id", ""),
+            "test_report": compact_report(initial_test.get("report")),
+            "repo_url": request.repoUrl,
+            "repo_path": repo_path, 
+            "branch_name": branch_name, # Pass branch name into the graph state for GitOps!
+            "file_content": "", "target_file": "", "bug_type": "", "target_line": 0, 
+            "proposed_fix": "", "failure_sites": [], "proposed_fixes": {}, "format_attempts": 0, "static_check_attempts": 0, "retry_count": 0, 
+            "fixes_applied": [], "run_status": "", "test_generated": False, "static_diagnostics": "", "timings": []
+        }
+        graph_input = initial_state
+
+    keep_checkout = False
+    reported_fixes = set()  # indexes into fixes_applied already sent as `fix` events
+    try:
+        # Stream the graph execution (sync Ministers run in worker threads; LLM calls share a rate limiter)
+        async for mode, output in current_graph().astream(graph_input, graph_config(run_id), stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                # The Repair / QA answer while it is still being written (agents/repair_stream.py)
+                yield {"event": "patch_progress", "data": json.dumps(output)}
+                continue
+            for node_name, state_update in output.items():
+                for event in timing_events(state_update.get("timings", []), timings):
+                    yield event
+                fixes = state_update.get("fixes_applied", fixes)
+                if state_update.get("test_report"):
+                    # Per-test counts of the run this node just did
+                    yield {"event": "tests", "data": json.dumps(report_summary(state_update["test_report"]))}
+            
+                if node_name == "Classifier":
+                    yield {"event": "log", "data": f"🔍 Bug Classified: {state_update.get('bug_type')}"}
+                
+                elif node_name == "Localizer":
+                    yield {"event": "log", "data": f"📍 Pinpointed to {state_update.get('target_file')} (Line {state_update.get('target_line')})"}
+                
+                elif node_name == "Repair":
+                    yield {"event": "step", "data": "4"}
+                    yield {"event": "log", "data": "🔨 Forging new code fix..."}
+                
+                elif node_name == "Validator":
+                    status = state_update.get('run_status')
+                    yield {"event": "log", "data": f"⚖️ Validation Status: {status}"}
+                    
+                elif node_name == "SpeculativeRepair":
+                    yield {"event": "step", "data": "4"}
+                    yield {"event": "log", "data": "🏁 Racing candidate fixes in parallel sandboxes..."}
+                
+                if node_name in ("Sandbox", "SpeculativeRepair", "FixMemory"):
+                    sandbox_status = state_update.get('run_status')
+                
+                    if sandbox_status == "TESTS_PASSED" and node_name == "FixMemory":
+                        yield {"event": "log", "data": "🧠 Reused a fix that passed before for this error: Tests Passed!"}
+
+                    elif sandbox_status == "TESTS_PASSED":
+                        yield {"event": "log", "data": "✅ Execution Environment: Tests Passed!"}
+                        
+                    elif node_name != "FixMemory":
+                        yield {"event": "log", "data": "❌ Execution Environment: Tests Failed! Looping back to AI..."}
+                        if state_update.get("raw_log_id"):
+                            yield {"event": "raw_log", "data": json.dumps({"url": f"/api/logs/{state_update['raw_log_id']}"})}
+
+                    # 🟢 UI turns green here, once per fix the sandbox confirmed (a batch can confirm several at once)
+                    for index, fix in enumerate(state_update.get("fixes_applied", [])):
+                        if fix.get("status") == "SUCCESS" and index not in reported_fixes:
+                            reported_fixes.add(index)
+                            yield {"event": "fix", "data": json.dumps(fix)}
+                    
+                elif node_name == "GitOps":
+                    git_status = state_update.get('run_status')
+                    if git_status == "PUSHED_TO_GITHUB":
+                        yield {"event": "log", "data": f"🚀 Successfully pushed branch {branch_name} to GitHub!"}
+                    else:
+                        yield {"event": "log", "data": f"⚠️ Git Push Failed: {git_status} (Check repo permissions)"}
+    except asyncio.CancelledError:
+        # Shutdown: with checkpoints on, the next process resumes this run, so its checkout has to stay
+        keep_checkout = graph_checkpointer is not None
+        raise
+    finally:
+        # The run is over (GitOps included): drop its views and its checkout
+        release_workspaces(repo_path)
+        if not keep_checkout:
+            repo_cache.release_checkout(repo_path)
+
+    # --- 4. FINISH & SCORE ---
+    yield {"event": "step", "data": "5"}
+    yield {"event": "log", "data": "Run Complete! Generating final score..."}
+    
+    score = metrics.compute_score(time.perf_counter() - started, fixes, timings)
+    
+    yield {"event": "score", "data": json.dumps(score)}
+    yield {"event": "status", "data": "PASSED"}
+
+
+def finish_run(run):
+    # Cancelled runs were cut off by a shutdown: they stay in the journal so the next process resumes them
+    if run.status == "CANCELLED":
+        return
+    run_journal.finish(run.run_id, run.status)
+    if graph_checkpointer is not None:
+        asyncio.create_task(graph_checkpointer.adelete_thread(run.run_id))
+
+# Runs start on submission; the stream endpoint only reads their buffered events.
+scheduler = RunScheduler(agent_workflow_generator, on_finish=finish_run)
+
+@app.post("/api/run-agent")
+async def start_agent_run(req: RunRequest, request: Request):
+    # The URL ends up on git's command line: only plain https URLs (no options, no local paths or other transports)
+    if not req.repoUrl.startswith("https://"):
+        return JSONResponse(status_code=400, content={"error": "repoUrl must be an https:// URL."})
+    req = req.model_copy(update={"priority": effective_priority(req, request.headers)})
+    run_id = str(uuid.uuid4())
+    try:
+        scheduler.submit(run_id, req, priority=req.priority)
+    except QueueFullError:
+        return JSONResponse(status_code=429, content={"error": "Agent is at capacity. Try again shortly."})
+    run_journal.start(run_id, req.model_dump(), priority=req.priority)
+    return {
+        "run_id": run_id,
+        "branch": generate_branch_name(req.teamName, req.leaderName),
+        "queue_position": scheduler.queue_position(run_id),
+        "eta_seconds": scheduler.eta_seconds(run_id)
+    }
+
+@app.get("/api/stream/{run_id}")
+async def stream_agent_logs(run_id: str, request: Request):
+    run = scheduler.runs.get(run_id)
+    if run is None:
+        return {"error": "Run ID not found"}
+    # Reconnects (and extra viewers) replay from the run's event log instead of re-running the pipeline
+    last_event_id = request.headers.get("last-event-id", "0")
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+    return EventSourceResponse(run.events.subscribe(last_event_id))
+
+@app.get("/api/runs/{run_id}")
+async def run_status(run_id: str):
+    run = scheduler.runs.get(run_id)
+    if run is None:
+        return {"error": "Run ID not found"}
+    return {
+        **run.to_dict(),
+        "last_event_id": run.events.last_id,
+        "subscribers": run.events.subscribers,
+        "queue_position": scheduler.queue_position(run_id),
+        "eta_seconds": scheduler.eta_seconds(run_id)
+    }
+
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """Run queue depth plus the separate sandbox and LLM concurrency caps."""
+    return {**scheduler.stats(), "sandboxes": sandbox_slots.stats(), "llm_calls": llm_slots.stats()}
+
+@app.get("/api/sandbox/pool")
+async def sandbox_pool_stats():
+    """Warm container pool health, plus the dependency-image and repo-mirror caches (incl. clone timings) and the sandbox limits."""
+    return {**container_pool.stats(), "deps_cache": dep_cache.stats, "repo_cache": repo_cache.stats, "limits": test_history.stats()}
+
+@app.get("/api/llm/cache")
+async def llm_cache_stats():
+    """Per-Minister hit/miss counters for the LLM response cache."""
+    return llm_cache.stats()
+
+@app.get("/api/repair/stats")
+async def repair_io_stats():
+    """Bytes sent to and received from Gemini, time spent and patch failures for the Minister of Repair, per prompt mode."""
+    from agents.ministers import repair_stats  # loads with the graph, not with the app
+    return repair_stats
+
+@app.get("/api/validation/stats")
+async def static_check_stats_endpoint():
+    """Fixes checked and rejected by the static pre-validation gate, i.e. sandbox boots avoided."""
+    return static_check_stats
+
+@app.get("/api/fix-memory/stats")
+async def fix_memory_stats():
+    """Lookups, exact and near hits, and how often a remembered fix passed again when reused."""
+    return fix_memory.stats()
+
+@app.get("/api/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: node, LLM, sandbox, clone and git histograms plus token counters."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/logs/{log_id}")
+async def get_raw_log(log_id: str):
+    """The full, uncompacted sandbox output behind a `raw_log` event."""
+    path = raw_log_path(log_id)
+    if path is None:
+        return {"error": "Log not found"}
+    return FileResponse(path, media_type="text/plain")
@@ -0,0 +1,87 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+from prometheus_client import Counter, Histogram
+
+# Graph nodes and clones take seconds to minutes; LLM calls and docker phases are usually sub-minute.
+SLOW_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+FAST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+HISTOGRAMS = {
+    "node": Histogram("healing_node_seconds", "Wall time per graph node", ["node"], buckets=SLOW_BUCKETS),
+    "llm": Histogram("healing_llm_seconds", "Latency per LLM call (cache hits included)", ["minister"], buckets=FAST_BUCKETS),
+    "sandbox": Histogram("healing_sandbox_seconds", "Sandbox time by phase: deps, startup, copy, tests, cold_run, local_run", ["phase"], buckets=FAST_BUCKETS),
+    "clone": Histogram("healing_clone_seconds", "Repository checkout time by start type", ["kind"], buckets=SLOW_BUCKETS),
+    "git": Histogram("healing_git_seconds", "GitOps time by step: github_api, push, pull_request", ["step"], buckets=FAST_BUCKETS),
+}
+LLM_TOKENS = Counter("healing_llm_tokens_total", "LLM tokens by Minister and kind (prompt / completion)", ["minister", "kind"])
+FIX_MEMORY_LOOKUPS = Counter("healing_fix_memory_lookups_total", "Fix-memory lookups by result (exact / near hit, miss)", ["result"])
+STATIC_REJECTIONS = Counter("healing_static_rejections_total", "Fixes rejected by the static pre-validation gate (each one a sandbox boot avoided)", ["kind"])
+
+# The timings list of whatever is being measured right now (a graph node, or a run's setup phase).
+# contextvars, so spans recorded deep inside a Minister land in that node's list without threading it through.
+_current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+def record(kind: str, name: str, seconds: float, **extra):
+    """Observes one span in its Prometheus histogram and adds it to the current timings list, if any."""
+    HISTOGRAMS[kind].labels(name).observe(seconds)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.append({"span": kind, "name": name, "seconds": round(seconds, 3), **extra})
+
+
+@contextmanager
+def span(kind: str, name: str, **extra):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - started, **extra)
+
+
+@contextmanager
+def collect_timings():
+    """`with collect_timings() as timings:` gathers every span recorded in this context (and copies of it)."""
+    timings = []
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def timed_node(name: str, node):
+    """Wraps a graph node so its own span, plus every span recorded inside it, ends up in state['timings']."""
+    @wraps(node)
+    def wrapper(state):
+        with collect_timings() as timings:
+            with span("node", name):
+                update = node(state)
+        update = dict(update or {})
+        update["timings"] = timings
+        return update
+    return wrapper
+
+
+def compute_score(wall_seconds: float, fixes: list, timings: list) -> dict:
+    """
+    The run's score from what was actually measured: a speed bonus for finishing under 5 minutes,
+    minus 2 points per fix attempt the sandbox rejected.
+    """
+    failed_attempts = sum(1 for fix in fixes if fix.get("status") == "FAILED")
+    speed_bonus = 10 if wall_seconds < 300 else 0
+    efficiency_penalty = -2 * failed_attempts
+    breakdown = {}
+    for timing in timings:
+        if timing["span"] != "node":
+            breakdown[timing["span"]] = round(breakdown.get(timing["span"], 0) + timing["seconds"], 3)
+    return {
+        "base": 100,
+        "speedBonus": speed_bonus,
+        "efficiencyPenalty": efficiency_penalty,
+        "total": 100 + speed_bonus + efficiency_penalty,
+        "wallSeconds": round(wall_seconds, 3),
+        "secondsBySpan": breakdown,
+    }
@@ -0,0 +1,243 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import metrics
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+MIRROR_DIR = os.path.join(CACHE_DIR, "mirrors")
+MIRROR_INDEX_PATH = os.path.join(CACHE_DIR, "mirrors_index.json")
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))  # 5 GB
+REPO_CACHE_ENABLED = os.getenv("REPO_CACHE_ENABLED", "1") == "1"
+GIT_TIMEOUT = int(os.getenv("CLONE_TIMEOUT", "300"))
+
+SSH_URL_RE = re.compile(r'^(?:[\w.-]+@)?(?P<host>[\w.-]+):(?P<path>[^/].*)$')
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_last_fetch = {}          # key -> time the last fetch of that mirror finished
+_active_checkouts = {}    # checkout path -> mirror key (mirrors in use are never evicted)
+
+stats = {
+    "hits": 0, "misses": 0, "shared_fetches": 0, "failures": 0, "evictions": 0,
+    # Clone wall time by start type: cold (new mirror), warm (mirror + fetch), shared (waited on another run's fetch)
+    "timings": {kind: {"count": 0, "total_seconds": 0.0, "last_seconds": 0.0} for kind in ("cold", "warm", "shared")},
+}
+_stats_lock = threading.Lock()
+
+
+def _count(counter: str):
+    with _stats_lock:
+        stats[counter] += 1
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """host/owner/repo, lowercased, without scheme, credentials or a trailing .git (so every spelling hits the same mirror)."""
+    url = repo_url.strip()
+    if "://" in url:
+        parts = urlsplit(url)
+        host, path = (parts.hostname or ""), parts.path
+    else:
+        match = SSH_URL_RE.match(url)
+        host, path = (match.group("host"), match.group("path")) if match else ("", url)
+    path = path.strip("/")
+    if path.endswith(".git"):
+        path = path[:-len(".git")]
+    return f"{host.lower()}/{path.lower()}".strip("/")
+
+
+def mirror_key(repo_url: str) -> str:
+    return hashlib.sha256(normalize_repo_url(repo_url).encode()).hexdigest()[:24]
+
+
+def _git(args: list, cwd: str = None) -> subprocess.CompletedProcess:
+    return subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True, timeout=GIT_TIMEOUT, check=True)
+
+
+@contextmanager
+def _index_lock():
+    """Cross-process lock around the on-disk LRU index (same scheme as the deps cache)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(MIRROR_INDEX_PATH + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _mirror_lock(key: str, blocking: bool = True):
+    """
+    One fetch / checkout at a time per mirror, across threads and processes.
+    Yields whether the lock is held: with `blocking` off it gives up at once (False) if someone else has it.
+    """
+    with _key_locks_guard:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    if not key_lock.acquire(blocking=blocking):
+        yield False
+        return
+    try:
+        with open(os.path.join(MIRROR_DIR, f"{key}.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                held = True
+            except BlockingIOError:
+                held = False
+            try:
+                yield held
+            finally:
+                if held:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        key_lock.release()
+
+
+def _load_index() -> dict:
+    try:
+        with open(MIRROR_INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(index: dict):
+    tmp_path = MIRROR_INDEX_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, MIRROR_INDEX_PATH)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _evict(index: dict, keep: str):
+    """
+    Drops least-recently-used mirrors until the cache fits in REPO_CACHE_MAX_BYTES. A mirror someone holds the lock of
+    (a fetch, or a checkout not registered in _active_checkouts yet) is skipped, never waited for: we hold the index lock.
+    """
+    total = sum(entry["size"] for entry in index.values())
+    for key, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+        if total <= REPO_CACHE_MAX_BYTES:
+            break
+        if key == keep:
+            continue
+        with _mirror_lock(key, blocking=False) as held:
+            if not held or key in set(_active_checkouts.values()):
+                continue
+            print(f"🧹 REPO CACHE: Evicting mirror of {entry['url']}")
+            shutil.rmtree(os.path.join(MIRROR_DIR, key), ignore_errors=True)
+        total -= index.pop(key)["size"]
+        _last_fetch.pop(key, None)
+        _count("evictions")
+
+
+def _record_timing(kind: str, seconds: float):
+    with _stats_lock:
+        timing = stats["timings"][kind]
+        timing["count"] += 1
+        timing["total_seconds"] = round(timing["total_seconds"] + seconds, 3)
+        timing["last_seconds"] = round(seconds, 3)
+    metrics.record("clone", kind, seconds)
+    print(f"⏱️ REPO CACHE: {kind} clone took {seconds:.2f}s")
+
+
+def _update_mirror(key: str, mirror_path: str, repo_url: str, waited_since: float) -> str:
+    """Creates or refreshes the bare mirror. Must hold the mirror lock. Returns the start type."""
+    if not os.path.isdir(mirror_path):
+        # Blobless: commits and trees only; blobs are fetched lazily for the commits we actually check out.
+        try:
+            _git(["clone", "--quiet", "--bare", "--filter=blob:none", "--", repo_url, mirror_path])
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            shutil.rmtree(mirror_path, ignore_errors=True)  # never leave a half-built mirror behind
+            raise
+        _count("misses")
+        return "cold"
+    if _last_fetch.get(key, 0) >= waited_since:
+        # Another run fetched while we were waiting on the lock; its fetch is ours too.
+        _count("shared_fetches")
+        return "shared"
+    _git(["fetch", "--quiet", "--prune", "--", repo_url, "+refs/heads/*:refs/heads/*"], cwd=mirror_path)
+    _count("hits")
+    return "warm"
+
+
+def checkout_from_mirror(repo_url: str, dest: str) -> bool:
+    """
+    Checks out the default branch of `repo_url` into `dest` as a worktree of the local mirror,
+    creating or fetching the mirror first. Returns False if git failed (callers fall back to a plain clone).
+    """
+    key = mirror_key(repo_url)
+    mirror_path = os.path.join(MIRROR_DIR, key)
+    started = time.monotonic()
+    waited_since = time.time()
+    try:
+        with _mirror_lock(key):
+            kind = _update_mirror(key, mirror_path, repo_url, waited_since)
+            _last_fetch[key] = time.time()
+            # Detached, so concurrent runs on one repo never fight over a branch name in the shared mirror
+            _git(["worktree", "add", "--quiet", "--detach", dest, "HEAD"], cwd=mirror_path)
+            _active_checkouts[os.path.abspath(dest)] = key
+    except subprocess.CalledProcessError as e:
+        _count("failures")
+        print(f"⚠️ REPO CACHE: git {e.cmd[1]} failed: {e.stderr.strip()}")
+        return False
+    except (subprocess.TimeoutExpired, OSError) as e:
+        _count("failures")
+        print(f"⚠️ REPO CACHE: {str(e)}")
+        return False
+    _record_timing(kind, time.monotonic() - started)
+
+    with _index_lock():
+        index = _load_index()
+        entry = index.setdefault(key, {"url": normalize_repo_url(repo_url)})
+        entry["last_used"] = time.time()
+        if kind != "shared" or "size" not in entry:
+            entry["size"] = _dir_size(mirror_path)
+        _evict(index, keep=key)
+        _save_index(index)
+    return True
+
+
+def adopt_checkout(repo_url: str, path: str):
+    """
+    Registers a worktree an earlier process checked out (a resumed run), like checkout_from_mirror does for new ones,
+    so its mirror is not evicted while the run uses it.
+    """
+    key = mirror_key(repo_url)
+    # Worktrees have a .git file; a directory means the run fell back to a plain clone
+    if os.path.isfile(os.path.join(path, ".git")) and os.path.isdir(os.path.join(MIRROR_DIR, key)):
+        _active_checkouts[os.path.abspath(path)] = key
+
+
+def release_checkout(path: str):
+    """Deletes a run's checkout and unregisters its worktree from the mirror."""
+    path = os.path.abspath(path)
+    key = _active_checkouts.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
+    if key is None:
+        return
+    mirror_path = os.path.join(MIRROR_DIR, key)
+    if os.path.isdir(mirror_path):
+        try:
+            with _mirror_lock(key):
+                _git(["worktree", "prune"], cwd=mirror_path)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+            pass
+
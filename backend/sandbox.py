@@ -1,55 +1,358 @@
-import subprocess
-import os
-
-def get_docker_config(repo_path: str):
-    """Dynamically detects the repository's language and testing framework."""
-    
-    # 1. Node.js Detection
-    if os.path.exists(os.path.join(repo_path, "package.json")):
-        return "node:18-alpine", "npm install && npm test"
-    
-    # 2. Python Detection (Default fallback)
-    test_cmd = ""
-    # Check if we need to install dependencies first
-    if os.path.exists(os.path.join(repo_path, "requirements.txt")):
-        test_cmd += "pip install -r requirements.txt -q && "
-        
-    # Dynamically chain test runners (if pytest fails/is missing, fallback to unittest)
-    test_cmd += "pytest || python -m unittest discover"
-    
-    # Using 'slim' instead of 'alpine' for Python to avoid C-extension build errors
-    return "python:3.11-slim", test_cmd
-
-def run_tests_in_docker(repo_path: str) -> dict:
-    """Executes the test suite inside a dynamically assigned, ephemeral Docker container."""
-    print("🐳 SPINNING UP DYNAMIC DOCKER CONTAINER...")
-    
-    abs_path = os.path.abspath(repo_path)
-    image, test_cmd = get_docker_config(repo_path)
-    
-    print(f"--- DOCKER CONFIG: Using image '{image}' ---")
-    
-    # The command dynamically uses the right image and right execution shell (sh is universal)
-    docker_cmd = [
-        "docker", "run", "--rm",
-        "-v", f"{abs_path}:/app",
-        "-w", "/app",
-        image,
-        "/bin/sh", "-c", test_cmd
-    ]
-    
-    try:
-        # 60-second timeout prevents infinite loop attacks from bad AI code
-        result = subprocess.run(docker_cmd, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            return {"passed": True, "error_logs": ""}
-        else:
-            return {"passed": False, "error_logs": result.stdout + "\n" + result.stderr}
-            
-    except subprocess.TimeoutExpired:
-        print("⏳ DOCKER TIMEOUT: AI code caused an infinite loop. Container destroyed.")
-        return {"passed": False, "error_logs": "Execution Timeout: Code took too long to execute (possible infinite loop)."}
-    except Exception as e:
-        print(f"❌ DOCKER ENGINE ERROR: {str(e)}")
-        return {"passed": False, "error_logs": f"Docker Engine Error: {str(e)}"}
\ No newline at end of file
+import asyncio
+import contextvars
+import time
+import subprocess
+import os
+import re
+import shlex
+import shutil
+import signal
+import tempfile
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sandbox_pool import container_pool, PoolExhaustedError, POOL_SIZE, WORKDIR
+from dep_cache import get_dependency_image
+from concurrency import sandbox_slots
+from log_compactor import LogCompactor, save_raw_log
+from sandbox_results import PYTEST_REPORT, JEST_REPORT, read_report
+from sandbox_limits import SANDBOX_MEMORY, resource_flags, suite_key, test_history, test_timeout, test_workers
+from repo_cache import checkout_from_mirror, REPO_CACHE_ENABLED
+import metrics
+
+CLONE_ROOT = os.getenv("CLONE_ROOT", os.path.join(tempfile.gettempdir(), "healing-agent-repos"))
+CLONE_TIMEOUT = int(os.getenv("CLONE_TIMEOUT", "300"))
+# "docker" (default) or "local". Local runs the test command directly on the host with no isolation:
+# only for trusted code such as the benchmark corpus, or machines without Docker.
+SANDBOX_BACKEND = os.getenv("SANDBOX_BACKEND", "docker")
+# Base images per language (get_docker_config); the pool pre-starts containers for them at startup
+PYTHON_IMAGE = "python:3.11-slim"
+NODE_IMAGE = "node:18-alpine"
+BASE_IMAGES = (PYTHON_IMAGE, NODE_IMAGE)
+# Where the test runners write their reports inside a container ($RESULTS_DIR; pooled containers wipe /tmp on reset)
+CONTAINER_RESULTS_DIR = "/tmp/healing-results"
+# `-n $TEST_WORKERS` when sharding was asked for and the repo's environment has pytest-xdist; nothing otherwise.
+# A command substitution rather than a separate statement, so it stays inside `pip install ... && pytest ...`.
+PYTEST_SHARD_ARGS = '$([ "${TEST_WORKERS:-1}" -gt 1 ] && python -c "import xdist" 2>/dev/null && echo "-n $TEST_WORKERS")'
+
+# Docker runs block on subprocess + the pool's condition variable, so they get their own
+# worker threads instead of competing with the event loop's default executor.
+SANDBOX_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SANDBOX_EXECUTOR_THREADS", "16")),
+    thread_name_prefix="sandbox"
+)
+
+def _new_clone_path() -> str:
+    os.makedirs(CLONE_ROOT, exist_ok=True)
+    return os.path.join(CLONE_ROOT, uuid.uuid4().hex)
+
+def clone_repository(repo_url: str):
+    """
+    Checks the target repository out into a fresh quarantine folder, via the local mirror cache when possible.
+    Returns the local path, or None on failure.
+    """
+    dest = _new_clone_path()
+    if REPO_CACHE_ENABLED and checkout_from_mirror(repo_url, dest):
+        return dest
+    shutil.rmtree(dest, ignore_errors=True)
+    started = time.perf_counter()
+    try:
+        # No mirror: a blobless clone still skips every historical file version
+        subprocess.run(
+            ["git", "clone", "--quiet", "--filter=blob:none", "--", repo_url, dest],  # `--`: a URL is never an option
+            capture_output=True, text=True, timeout=CLONE_TIMEOUT, check=True
+        )
+        metrics.record("clone", "direct", time.perf_counter() - started)
+        return dest
+    except subprocess.CalledProcessError as e:
+        print(f"❌ GIT CLONE ERROR: {e.stderr.strip()}")
+    except (subprocess.TimeoutExpired, OSError) as e:
+        print(f"❌ GIT CLONE ERROR: {str(e)}")
+    return None
+
+async def clone_repository_async(repo_url: str):
+    """Awaitable wrapper around clone_repository; mirror locks and git calls run on a worker thread."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor doesn't carry contextvars over; copy them so the clone span reaches the caller's timings
+    return await loop.run_in_executor(None, contextvars.copy_context().run, clone_repository, repo_url)
+
+# pytest short summary ("FAILED tests/test_x.py::test_y - AssertionError") and unittest ("FAIL: test_y (test_x.TestX.test_y)")
+PYTEST_FAILURE_RE = re.compile(r'^(?:FAILED|ERROR)\s+(\S+::\S+)', re.MULTILINE)
+UNITTEST_FAILURE_RE = re.compile(r'^(?:FAIL|ERROR):\s+\w+\s+\(([\w.]+)\)', re.MULTILINE)
+
+def extract_failing_tests(error_logs: str) -> list:
+    """Pulls the failing test IDs out of a previous run's output (pytest node IDs or unittest dotted IDs)."""
+    failing = []
+    for match in PYTEST_FAILURE_RE.findall(error_logs or ""):
+        if match not in failing:
+            failing.append(match)
+    if failing:
+        return failing
+    for match in UNITTEST_FAILURE_RE.findall(error_logs or ""):
+        if match not in failing:
+            failing.append(match)
+    return failing
+
+def rerunnable_failures(report, error_logs: str) -> list:
+    """Failing test IDs the runner can be pointed at again: from the run's report when there is one, else from its log."""
+    if report:
+        return report["failing"] if report["runner"] in ("pytest", "unittest") else []
+    return extract_failing_tests(error_logs)
+
+def _uses_jest(repo_path: str) -> bool:
+    try:
+        with open(os.path.join(repo_path, "package.json"), "r", encoding="utf-8") as f:
+            script = (json.load(f).get("scripts") or {}).get("test", "")
+    except (OSError, ValueError, AttributeError):
+        return False
+    return isinstance(script, str) and "jest" in script
+
+def get_docker_config(repo_path: str, tests: list = None, fail_fast: bool = True):
+    """
+    Dynamically detects the repository's language and testing framework.
+    If `tests` is given, the command only runs those test IDs (Python only; Node always runs the full suite),
+    stopping at the first one that still fails unless `fail_fast` is off.
+    Runners that can write a machine-readable report put it in $RESULTS_DIR (see sandbox_results.py),
+    and pytest-xdist / Jest split the tests over $TEST_WORKERS workers (see sandbox_limits.py).
+    """
+    
+    # 1. Node.js Detection
+    if os.path.exists(os.path.join(repo_path, "package.json")):
+        # Other test scripts (plain node, mocha...) get no extra flags: unknown options would break them
+        # Jest sizes its workers from the host's cores, not the container's --cpus cap, so it is always told
+        npm_test = (f'npm test -- --json --outputFile="$RESULTS_DIR/{JEST_REPORT}" --maxWorkers="${{TEST_WORKERS:-1}}"'
+                    if _uses_jest(repo_path) else "npm test")
+        deps_image = get_dependency_image(repo_path, NODE_IMAGE) if SANDBOX_BACKEND == "docker" else None
+        if deps_image:
+            # node_modules lives in the cached layer and the image's NODE_PATH / PATH point at it.
+            # Nothing is linked into the workspace: a cold run bind-mounts the checkout, and GitOps would commit the link.
+            return deps_image, npm_test
+        return NODE_IMAGE, f"npm install && {npm_test}"
+    
+    # 2. Python Detection (Default fallback)
+    image = PYTHON_IMAGE
+    test_cmd = ""
+    # Check if we need to install dependencies first (skipped entirely when the deps layer is cached)
+    if os.path.exists(os.path.join(repo_path, "requirements.txt")):
+        deps_image = get_dependency_image(repo_path, image) if SANDBOX_BACKEND == "docker" else None
+        if deps_image:
+            image = deps_image
+        else:
+            test_cmd += "pip install -r requirements.txt -q && "
+    
+    # xunit1 adds the file of every test to the report, which turns its entries back into node IDs
+    pytest_cmd = f'pytest {PYTEST_SHARD_ARGS} -o junit_family=xunit1 --junitxml="$RESULTS_DIR/{PYTEST_REPORT}"'
+    if tests:
+        quoted = " ".join(shlex.quote(test_id) for test_id in tests)
+        if "::" in tests[0]:
+            # -x: stop at the first test that still fails, when a yes/no is all we need
+            test_cmd += f"{pytest_cmd} {'-x ' if fail_fast else ''}-q {quoted}"
+        else:
+            test_cmd += f"python -m unittest -v {quoted}"
+        return image, test_cmd
+        
+    # Dynamically chain test runners: fall back to unittest only if pytest is missing (127) or found no tests (5),
+    # i.e. only when pytest ran nothing, so the suite never runs twice.
+    # A plain `pytest || unittest` would turn real pytest failures into a green "Ran 0 tests" run.
+    test_cmd += f"{pytest_cmd}; rc=$?; if [ $rc -eq 5 ] || [ $rc -eq 127 ]; then python -m unittest discover -v; else exit $rc; fi"
+    
+    # Using 'slim' instead of 'alpine' for Python to avoid C-extension build errors
+    return image, test_cmd
+
+# How often a running test command checks whether its result is still wanted
+CANCEL_POLL_SECONDS = 0.5
+
+
+class SandboxCancelled(Exception):
+    """The test run was stopped because nobody wants its result any more (a losing speculative candidate)."""
+
+
+def _run_command(args: list, timeout: int, cancelled=None, on_stop=None, **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(capture_output=True, text=True, timeout=...) that also stops when the `cancelled` Event is set.
+    On a timeout or a cancel the command's whole process group is killed and `on_stop()` runs (e.g. to remove
+    a container the docker CLI was only a client of), then TimeoutExpired / SandboxCancelled is raised.
+    """
+    deadline = time.monotonic() + timeout
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True, **kwargs) as proc:
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=CANCEL_POLL_SECONDS)
+                return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+            except subprocess.TimeoutExpired:
+                stopped = cancelled is not None and cancelled.is_set()
+                if not stopped and time.monotonic() < deadline:
+                    continue
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            proc.communicate()
+            if on_stop:
+                on_stop()
+            if stopped:
+                raise SandboxCancelled()
+            raise subprocess.TimeoutExpired(args, timeout)
+
+def _env_flags(env: dict) -> list:
+    return [flag for key, value in env.items() for flag in ("-e", f"{key}={value}")]
+
+def _run_cold(abs_path: str, image: str, test_cmd: str, results_dir: str, env: dict, timeout: int, cancelled=None) -> subprocess.CompletedProcess:
+    """Legacy path: a fresh `docker run --rm` per test run (used when the pool is disabled)."""
+    name = f"healing-cold-{uuid.uuid4().hex[:12]}"
+    docker_cmd = [
+        "docker", "run", "--rm", "--name", name,
+        *resource_flags(),
+        "-v", f"{abs_path}:/app",
+        "-v", f"{results_dir}:{CONTAINER_RESULTS_DIR}",
+        *_env_flags({**env, "RESULTS_DIR": CONTAINER_RESULTS_DIR}),
+        "-w", "/app",
+        image,
+        "/bin/sh", "-c", test_cmd
+    ]
+    with metrics.span("sandbox", "cold_run"):
+        # Killing the docker CLI leaves the container running the tests, so a timeout or cancel removes it too
+        return _run_command(docker_cmd, timeout, cancelled, on_stop=lambda: subprocess.run(["docker", "rm", "-f", name], capture_output=True))
+
+def _run_local(abs_path: str, test_cmd: str, results_dir: str, env: dict, timeout: int, cancelled=None) -> subprocess.CompletedProcess:
+    """SANDBOX_BACKEND=local: the same command, straight on the host (no container, no isolation)."""
+    with metrics.span("sandbox", "local_run"):
+        return _run_command(["/bin/sh", "-c", test_cmd], timeout, cancelled, cwd=abs_path,
+                            env={**os.environ, **env, "RESULTS_DIR": results_dir})
+
+def _pipe(producer: list, consumer: list, timeout: int = 60, check: bool = False):
+    """`producer | consumer`, e.g. a tar stream into or out of a container."""
+    with subprocess.Popen(producer, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as source:
+        try:
+            return subprocess.run(consumer, stdin=source.stdout, capture_output=True, timeout=timeout, check=check)
+        finally:
+            source.stdout.close()
+            source.kill()
+
+def _run_pooled(abs_path: str, image: str, test_cmd: str, results_dir: str, env: dict, timeout: int, cancelled=None) -> subprocess.CompletedProcess:
+    """Copies the repo into a warm pooled container and runs the suite via `docker exec`."""
+    with metrics.span("sandbox", "startup"):
+        container = container_pool.acquire(image)
+    healthy = False
+    try:
+        # `docker cp` cannot write into the tmpfs mounts of a read-only pooled container, so the repo goes in as a tar stream
+        with metrics.span("sandbox", "copy"):
+            _pipe(["tar", "-C", abs_path, "-cf", "-", "."],
+                  ["docker", "exec", "-i", container.container_id, "tar", "-xf", "-", "-C", WORKDIR], check=True)
+        with metrics.span("sandbox", "tests"):
+            result = _run_command(
+                ["docker", "exec", "-w", WORKDIR, *_env_flags({**env, "RESULTS_DIR": CONTAINER_RESULTS_DIR}), container.container_id,
+                 "/bin/sh", "-c", f'export PATH="$PYTHONUSERBASE/bin:$PATH"; mkdir -p "$RESULTS_DIR"; {test_cmd}'],
+                timeout, cancelled
+            )
+        # The reports come back out the same way the repo went in; a run that wrote none just has nothing to copy
+        _pipe(["docker", "exec", container.container_id, "/bin/sh", "-c", f'[ -d {CONTAINER_RESULTS_DIR} ] && tar -C {CONTAINER_RESULTS_DIR} -cf - .'],
+              ["tar", "-xf", "-", "-C", results_dir])
+        healthy = True
+        return result
+    finally:
+        # A timed-out or cancelled exec may still be running inside the container, so it is destroyed, never reused.
+        container_pool.release(container, healthy=healthy)
+
+def warm_sandbox_pool():
+    """Starts pre-warming pooled containers for the base images in the background (no-op without the docker pool)."""
+    if SANDBOX_BACKEND != "docker" or POOL_SIZE <= 0:
+        return
+    for image in BASE_IMAGES:
+        container_pool.warm_async(image)
+
+def _failure_result(stdout: str, stderr: str, report=None) -> dict:
+    """Compacts the output for the Ministers and keeps the untouched log on disk for the UI."""
+    compactor = LogCompactor()
+    for stream in (stdout, stderr):
+        for line in stream.splitlines():
+            compactor.feed(line)
+    error_logs, compaction = compactor.finish()
+    raw_log_id = save_raw_log(stdout + "\n" + stderr)
+    print(f"--- LOG COMPACTION: {compaction['raw_bytes']} B -> {compaction['compact_bytes']} B (x{compaction['compression_ratio']}) ---")
+    return {"passed": False, "error_logs": error_logs, "raw_log_id": raw_log_id, "compaction": compaction, "report": report}
+
+def run_tests_in_docker(repo_path: str, tests: list = None, fail_fast: bool = True, cancelled=None) -> dict:
+    """
+    Executes the test suite inside a warm, pooled Docker container (or a cold one if pooling is off).
+    Pass `tests` to run only those test IDs instead of the whole suite, and a threading.Event as `cancelled`
+    to stop the run (and remove its container) as soon as the Event is set; the result then has "cancelled": True.
+    The timeout and the number of test workers come from the suite's earlier runs (see sandbox_limits.py).
+    Returns {"passed", "error_logs", "report"} plus the raw log id on failure; "report" is a
+    sandbox_results.TestReport, or None when the runner produces no report.
+    """
+    abs_path = os.path.abspath(repo_path)
+    with metrics.span("sandbox", "deps"):
+        image, test_cmd = get_docker_config(repo_path, tests, fail_fast)
+    
+    print(f"--- DOCKER CONFIG: Using image '{image}' ---")
+
+    # The timeout fits the suite's history, so a slow suite is not mistaken for an infinite loop in bad AI code
+    suite = suite_key(abs_path)
+    estimate = test_history.estimate(suite)
+    timeout = test_timeout(estimate)
+    
+    results_dir = tempfile.mkdtemp(prefix="healing-results-")
+    try:
+        with sandbox_slots.acquire():
+            if cancelled is not None and cancelled.is_set():
+                raise SandboxCancelled()  # stopped while waiting for the slot
+            # Sized once the slot is held, when the number of runs sharing the host is known
+            workers = test_workers(estimate, len(tests) if tests else 0, in_container=SANDBOX_BACKEND != "local")
+            env = {"TEST_WORKERS": str(workers)}
+            if workers > 1:
+                test_history.count("sharded_runs")
+            print(f"--- SANDBOX LIMITS: {workers} test worker(s), {timeout}s timeout ---")
+            started = time.monotonic()
+            if SANDBOX_BACKEND == "local":
+                print("🖥️ RUNNING TESTS LOCALLY (SANDBOX_BACKEND=local)...")
+                result = _run_local(abs_path, test_cmd, results_dir, env, timeout, cancelled)
+            elif POOL_SIZE > 0:
+                print("🐳 ACQUIRING WARM DOCKER CONTAINER FROM POOL...")
+                result = _run_pooled(abs_path, image, test_cmd, results_dir, env, timeout, cancelled)
+                print(f"--- SANDBOX POOL: {container_pool.stats()} ---")
+            else:
+                print("🐳 SPINNING UP DYNAMIC DOCKER CONTAINER...")
+                result = _run_cold(abs_path, image, test_cmd, results_dir, env, timeout, cancelled)
+            wall_seconds = time.monotonic() - started
+
+        # Jest reports absolute paths as the runner saw them: /app inside a container
+        runner_root = abs_path if SANDBOX_BACKEND == "local" else WORKDIR
+        report = read_report(results_dir, runner_root, result.stderr + "\n" + result.stdout)
+        if report:
+            report["selected"] = bool(tests)
+            print(f"--- TEST REPORT ({report['runner']}): {report['collected']} collected, {report['passed']} passed, "
+                  f"{report['failed']} failed, {report['errors']} errors, {report['skipped']} skipped in {report['duration']}s ---")
+        if not tests:
+            test_history.record(suite, wall_seconds, report)
+        
+        if result.returncode == 0:
+            return {"passed": True, "error_logs": "", "report": report}
+        stderr = result.stderr
+        if result.returncode == 137 and SANDBOX_BACKEND != "local":
+            stderr += f"\nKilled (SIGKILL): the test run most likely exceeded the sandbox memory limit ({SANDBOX_MEMORY})."
+        return _failure_result(result.stdout, stderr, report)
+            
+    except SandboxCancelled:
+        print("🛑 SANDBOX: Test run cancelled, its result is no longer needed.")
+        return {"passed": False, "cancelled": True, "error_logs": "Cancelled: another candidate fix already passed.", "report": None}
+    except subprocess.TimeoutExpired:
+        test_history.count("timeouts")
+        if not tests:
+            test_history.record(suite, timeout, timed_out=True)
+        usual = f" (this suite usually finishes within {estimate['wall_seconds']:.0f}s)" if estimate and not estimate["timed_out"] else ""
+        print(f"⏳ DOCKER TIMEOUT: Tests ran past {timeout}s{usual}. Container destroyed.")
+        return {"passed": False, "error_logs": f"Execution Timeout: Tests took longer than {timeout}s{usual} (possible infinite loop).", "report": None}
+    except PoolExhaustedError as e:
+        print(f"⏳ SANDBOX POOL EXHAUSTED: {str(e)}")
+        return {"passed": False, "error_logs": f"Sandbox Pool Exhausted: {str(e)}. The tests did not run; try again when fewer runs are active.", "report": None}
+    except Exception as e:
+        print(f"❌ DOCKER ENGINE ERROR: {str(e)}")
+        return {"passed": False, "error_logs": f"Docker Engine Error: {str(e)}", "report": None}
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+async def run_tests_in_docker_async(repo_path: str, tests: list = None) -> dict:
+    """Awaitable wrapper around run_tests_in_docker that runs it on the sandbox executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(SANDBOX_EXECUTOR, contextvars.copy_context().run, run_tests_in_docker, repo_path, tests)
@@ -0,0 +1,186 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrency import MAX_CONCURRENT_SANDBOXES, sandbox_slots
+
+CACHE_DIR = os.getenv("HEALING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "healing-agent"))
+TEST_HISTORY_DB = os.path.join(CACHE_DIR, "test_history.sqlite")
+HOST_CPUS = os.cpu_count() or 1
+
+# Caps every sandbox container gets. CPUs default to an even share of the host between the concurrent sandboxes.
+# An empty value leaves that cap off.
+SANDBOX_CPUS = os.getenv("SANDBOX_CPUS") or str(max(1.0, round(HOST_CPUS / MAX_CONCURRENT_SANDBOXES, 2)))
+SANDBOX_MEMORY = os.getenv("SANDBOX_MEMORY", "2g")
+SANDBOX_PIDS_LIMIT = os.getenv("SANDBOX_PIDS_LIMIT", "512")
+# Test workers per run (pytest-xdist / Jest): "auto" sizes them from the free cores, the concurrent runs and
+# the suite's history; a number fixes them; 1 turns sharding off.
+SANDBOX_TEST_WORKERS = os.getenv("SANDBOX_TEST_WORKERS", "auto")
+# One more worker per this many seconds of serial test time. Shorter suites stay serial: a worker costs about a second to start.
+SHARD_SECONDS_PER_WORKER = float(os.getenv("SANDBOX_SHARD_SECONDS_PER_WORKER", "5"))
+# Timeout = clamp(FACTOR x the slowest recent run of the suite, MIN, MAX); MIN for a suite with no history.
+# A suite that has only ever timed out gets FACTOR x its last timeout, so a slow one grows into a fitting limit.
+SANDBOX_TIMEOUT_MIN = int(os.getenv("SANDBOX_TIMEOUT_MIN", "60"))
+SANDBOX_TIMEOUT_MAX = int(os.getenv("SANDBOX_TIMEOUT_MAX", "900"))
+SANDBOX_TIMEOUT_FACTOR = float(os.getenv("SANDBOX_TIMEOUT_FACTOR", "3"))
+# Full-suite runs kept per suite
+TEST_HISTORY_RUNS = 10
+
+TEST_FILE_RE = re.compile(r'(^|/)(tests?|__tests__)/|(^|/)(test_[^/]*\.py|[^/]*_test\.py|[^/]*\.(test|spec)\.[jt]sx?)$')
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".pytest_cache"}
+
+
+def resource_flags() -> list:
+    """`docker run` flags for the CPU, memory and process caps."""
+    flags = []
+    for flag, value in (("--cpus", SANDBOX_CPUS), ("--memory", SANDBOX_MEMORY), ("--pids-limit", SANDBOX_PIDS_LIMIT)):
+        if value:
+            flags += [flag, value]
+    return flags
+
+
+def suite_key(repo_path: str) -> str:
+    """
+    Identifies a repo's test suite across checkouts and workspace views (whose paths are random):
+    a hash of its top-level entries and test file paths.
+    """
+    entries = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        rel_root = os.path.relpath(root, repo_path).replace(os.sep, "/")
+        if rel_root == ".":
+            entries += sorted(dirs) + sorted(names)
+            continue
+        entries += sorted(f"{rel_root}/{name}" for name in names if TEST_FILE_RE.search(f"{rel_root}/{name}"))
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()[:16]
+
+
+class TestHistory:
+    """How long each suite's full runs took, so the next run's timeout and worker count fit the suite."""
+
+    def __init__(self, path: str = TEST_HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {"runs_recorded": 0, "timeouts": 0, "sharded_runs": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY,
+                    suite TEXT NOT NULL,
+                    wall_seconds REAL NOT NULL,
+                    test_seconds REAL NOT NULL,
+                    tests INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    timed_out INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            try:
+                # History written before timed-out runs were kept
+                self._conn.execute("ALTER TABLE runs ADD COLUMN timed_out INTEGER NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # already there
+            self._conn.execute("CREATE INDEX IF NOT EXISTS runs_by_suite ON runs (suite, created)")
+            self._conn.commit()
+        return self._conn
+
+    def record(self, suite: str, wall_seconds: float, report=None, timed_out: bool = False):
+        """Stores a full-suite run; for a timed-out one `wall_seconds` is the timeout it hit."""
+        test_seconds = report["duration"] if report else wall_seconds
+        tests = report["collected"] if report else 0
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO runs (suite, wall_seconds, test_seconds, tests, created, timed_out) VALUES (?, ?, ?, ?, ?, ?)",
+                (suite, round(wall_seconds, 3), round(test_seconds, 3), tests, time.time(), int(timed_out))
+            )
+            db.execute(
+                "DELETE FROM runs WHERE suite = ? AND id NOT IN (SELECT id FROM runs WHERE suite = ? ORDER BY created DESC LIMIT ?)",
+                (suite, suite, TEST_HISTORY_RUNS)
+            )
+            db.commit()
+            self.counters["runs_recorded"] += 1
+
+    def estimate(self, suite: str):
+        """
+        {"wall_seconds", "test_seconds", "tests", "timed_out"} of the suite's recent full runs (slowest wall,
+        typical test time), or None. Timed-out runs only count while the suite has no completed run: once it has,
+        a later timeout is a bad fix (an infinite loop), not a sign that the suite needs longer.
+        """
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT wall_seconds, test_seconds, tests, timed_out FROM runs WHERE suite = ? ORDER BY created DESC LIMIT ?",
+                (suite, TEST_HISTORY_RUNS)
+            ).fetchall()
+        completed = [row for row in rows if not row[3]]
+        if completed:
+            middle = len(completed) // 2
+            return {
+                "wall_seconds": max(row[0] for row in completed),
+                "test_seconds": sorted(row[1] for row in completed)[middle],
+                "tests": sorted(row[2] for row in completed)[middle],
+                "timed_out": False,
+            }
+        if rows:
+            return {"wall_seconds": max(row[0] for row in rows), "test_seconds": 0.0, "tests": 0, "timed_out": True}
+        return None
+
+    def count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counters)
+            suites = self._db().execute("SELECT COUNT(DISTINCT suite) FROM runs").fetchone()[0]
+        return {
+            "suites": suites,
+            **counts,
+            "cpus": SANDBOX_CPUS,
+            "memory": SANDBOX_MEMORY,
+            "pids_limit": SANDBOX_PIDS_LIMIT,
+            "test_workers": SANDBOX_TEST_WORKERS,
+        }
+
+
+test_history = TestHistory()
+
+
+def test_timeout(estimate) -> int:
+    if estimate is None:
+        return SANDBOX_TIMEOUT_MIN
+    return int(min(SANDBOX_TIMEOUT_MAX, max(SANDBOX_TIMEOUT_MIN, math.ceil(estimate["wall_seconds"] * SANDBOX_TIMEOUT_FACTOR))))
+
+
+def test_workers(estimate, selected: int = 0, in_container: bool = True) -> int:
+    """
+    Workers for one run: enough to split the suite's serial test time into SHARD_SECONDS_PER_WORKER pieces,
+    but no more than this run's share of the host (free cores, split between the sandboxes running now)
+    and, in a container, its --cpus cap. `selected`: how many test IDs a rerun is limited to (0 = full suite).
+    Call it while holding a sandbox slot.
+    """
+    if SANDBOX_TEST_WORKERS != "auto":
+        return max(1, int(SANDBOX_TEST_WORKERS))
+    if estimate is None:
+        return 1
+    test_seconds = estimate["test_seconds"]
+    if selected and estimate["tests"]:
+        test_seconds *= min(1.0, selected / estimate["tests"])
+    wanted = math.floor(test_seconds / SHARD_SECONDS_PER_WORKER)
+    if wanted < 2:
+        return 1
+    try:
+        free = HOST_CPUS - os.getloadavg()[0]
+    except (AttributeError, OSError):
+        free = HOST_CPUS
+    share = min(free, HOST_CPUS / max(1, sandbox_slots.in_use))
+    if in_container and SANDBOX_CPUS:
+        share = min(share, float(SANDBOX_CPUS))
+    return max(1, min(wanted, int(share)))
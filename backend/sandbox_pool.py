@@ -0,0 +1,246 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrency import MAX_CONCURRENT_SANDBOXES
+from sandbox_limits import resource_flags
+
+# How many idle containers we keep warm per image, and how many runs a container
+# serves before we throw it away anyway.
+POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "2"))
+MAX_USES = int(os.getenv("SANDBOX_POOL_MAX_USES", "10"))
+# Containers alive per image, busy ones included. Every acquire() happens while holding a sandbox slot, so with
+# at least one container per slot a run never waits for another run's tests; ACQUIRE_TIMEOUT is only a safety net.
+MAX_LIVE = max(POOL_SIZE, MAX_CONCURRENT_SANDBOXES)
+ACQUIRE_TIMEOUT = float(os.getenv("SANDBOX_POOL_ACQUIRE_TIMEOUT", "120"))
+# Idle containers older than this are stopped (every deps image would otherwise keep POOL_SIZE running forever)
+IDLE_TTL = float(os.getenv("SANDBOX_POOL_IDLE_TTL", "600"))
+
+WORKDIR = "/app"
+# Pooled containers serve different repos one after another, so their root filesystem is read-only and
+# everything a run can write lives on tmpfs mounts that the reset empties. A fallback `pip install` goes to
+# the user site under /tmp (PIP_USER), npm's cache under $HOME=/tmp/home.
+SCRATCH_DIRS = (WORKDIR, "/tmp", "/dev/shm")
+SCRATCH_ENV = {"HOME": "/tmp/home", "PIP_USER": "1", "PYTHONUSERBASE": "/tmp/pyuser"}
+
+
+class PoolExhaustedError(Exception):
+    """No container for the image became free within ACQUIRE_TIMEOUT (more runs than containers, or Docker too slow to start one)."""
+
+
+class PooledContainer:
+    """A long-lived `sleep infinity` container that runs tests through `docker exec`."""
+
+    def __init__(self, image: str, container_id: str):
+        self.image = image
+        self.container_id = container_id
+        self.uses = 0
+        self.idle_since = time.monotonic()
+
+
+class ContainerPool:
+    """Keeps pre-started, isolated sandbox containers per image and hands them out one run at a time."""
+
+    def __init__(self, size: int = POOL_SIZE, max_uses: int = MAX_USES, max_live: int = MAX_LIVE):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_live = max(size, max_live)
+        self._idle = defaultdict(list)    # image -> [PooledContainer]
+        self._live = defaultdict(int)     # image -> containers alive (idle + busy)
+        self._cond = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.wait_seconds = 0.0
+        self.recycled = 0
+        self.reaped = 0
+        self._reaper = None
+        self._stopping = threading.Event()
+
+    # --- 🐳 Docker plumbing ---
+
+    def _start_container(self, image: str) -> PooledContainer:
+        name = f"healing-sandbox-{uuid.uuid4().hex[:12]}"
+        cmd = [
+            "docker", "run", "-d", "--rm",
+            "--name", name,
+            "--label", "healing-agent.pool=1",
+            *resource_flags(),
+            "--read-only",
+            "--tmpfs", f"{WORKDIR}:rw,exec,nosuid",
+            "--tmpfs", "/tmp:rw,exec,nosuid",
+            *[flag for key, value in SCRATCH_ENV.items() for flag in ("-e", f"{key}={value}")],
+            "-w", WORKDIR,
+            image,
+            "sleep", "infinity"
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120, check=True)
+        return PooledContainer(image, result.stdout.strip())
+
+    def _destroy(self, container: PooledContainer):
+        subprocess.run(["docker", "rm", "-f", container.container_id], capture_output=True)
+
+    def _reset(self, container: PooledContainer) -> bool:
+        """
+        Kills whatever the last run left running and empties the tmpfs scratch dirs, the only places it could write.
+        Fails (and the container is recycled) if anything is left behind.
+        """
+        dirs = " ".join(SCRATCH_DIRS)
+        reset_cmd = f'kill -9 -1 2>/dev/null; find {dirs} -mindepth 1 -delete 2>/dev/null; [ -z "$(find {dirs} -mindepth 1 | head -n 1)" ]'
+        try:
+            result = subprocess.run(
+                ["docker", "exec", container.container_id, "/bin/sh", "-c", reset_cmd],
+                capture_output=True, timeout=30
+            )
+            return result.returncode == 0
+        except subprocess.TimeoutExpired:
+            return False
+
+    # --- 🔁 Pool lifecycle ---
+
+    def warm(self, image: str):
+        """Pre-starts containers for `image` until the idle pool is full."""
+        while True:
+            with self._cond:
+                if self._live[image] >= self.size:
+                    return
+                self._live[image] += 1
+            try:
+                container = self._start_container(image)
+            except Exception as e:
+                print(f"⚠️ SANDBOX POOL: Could not pre-start {image}: {e}")
+                with self._cond:
+                    self._live[image] -= 1
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._idle[image].append(container)
+                self._cond.notify_all()
+
+    def warm_async(self, image: str):
+        """warm() on a background thread (pulling and starting containers can take a while)."""
+        self._start_reaper()
+        threading.Thread(target=self.warm, args=(image,), daemon=True).start()
+
+    def _start_reaper(self):
+        with self._cond:
+            if self._reaper is not None or IDLE_TTL <= 0:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="sandbox-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._stopping.wait(min(IDLE_TTL / 2, 60)):
+            self.reap_idle()
+
+    def reap_idle(self, max_idle: float = IDLE_TTL) -> int:
+        """Stops containers that have sat idle for more than `max_idle` seconds."""
+        now = time.monotonic()
+        with self._cond:
+            expired = []
+            for image, idle in self._idle.items():
+                expired += [c for c in idle if now - c.idle_since > max_idle]
+                idle[:] = [c for c in idle if now - c.idle_since <= max_idle]
+            for container in expired:
+                self._live[container.image] -= 1
+            self.reaped += len(expired)
+            self._cond.notify_all()
+        for container in expired:
+            self._destroy(container)
+        if expired:
+            print(f"🧹 SANDBOX POOL: Stopped {len(expired)} idle container(s)")
+        return len(expired)
+
+    def acquire(self, image: str) -> PooledContainer:
+        """Hands out an idle container, cold-starting one if the image is under max_live, otherwise waits."""
+        self._start_reaper()
+        wait_start = time.monotonic()
+        with self._cond:
+            while True:
+                if self._idle[image]:
+                    container = self._idle[image].pop()
+                    self.hits += 1
+                    self.wait_seconds += time.monotonic() - wait_start
+                    return container
+                if self._live[image] < self.max_live:
+                    self._live[image] += 1
+                    self.misses += 1
+                    break
+                remaining = ACQUIRE_TIMEOUT - (time.monotonic() - wait_start)
+                if remaining <= 0:
+                    raise PoolExhaustedError(f"No sandbox container for {image} became free in {ACQUIRE_TIMEOUT}s")
+                self._cond.wait(timeout=remaining)
+
+        try:
+            container = self._start_container(image)
+        except Exception:
+            with self._cond:
+                self._live[image] -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self.wait_seconds += time.monotonic() - wait_start
+        return container
+
+    def release(self, container: PooledContainer, healthy: bool = True):
+        """Returns a container to the pool, or recycles it if it is tainted or worn out."""
+        container.uses += 1
+        if healthy and container.uses < self.max_uses and self._reset(container):
+            container.idle_since = time.monotonic()
+            with self._cond:
+                # Busy containers beyond the warm size were started for a burst: only `size` of them stay idle
+                keep = len(self._idle[container.image]) < self.size
+                if keep:
+                    self._idle[container.image].append(container)
+                else:
+                    self._live[container.image] -= 1
+                self._cond.notify_all()
+            if not keep:
+                self._destroy(container)
+            return
+
+        self._destroy(container)
+        with self._cond:
+            self._live[container.image] -= 1
+            self.recycled += 1
+            self._cond.notify_all()
+        self.warm_async(container.image)
+
+    def drop_image(self, image: str):
+        """Destroys idle containers of an image that is about to be removed (e.g. an evicted deps layer)."""
+        with self._cond:
+            containers = self._idle.pop(image, [])
+            self._live[image] -= len(containers)
+            self._cond.notify_all()
+        for container in containers:
+            self._destroy(container)
+
+    def shutdown(self):
+        self._stopping.set()
+        with self._cond:
+            containers = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+            self._live.clear()
+        for container in containers:
+            self._destroy(container)
+
+    def stats(self) -> dict:
+        with self._cond:
+            requests = self.hits + self.misses
+            return {
+                "pool_size": self.size,
+                "max_live": self.max_live,
+                "live": dict(self._live),
+                "idle": {image: len(idle) for image, idle in self._idle.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+                "wait_seconds_total": round(self.wait_seconds, 3),
+                "wait_seconds_avg": round(self.wait_seconds / requests, 3) if requests else 0.0,
+                "recycled": self.recycled,
+                "reaped": self.reaped,
+            }
+
+
+container_pool = ContainerPool()
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import List, TypedDict
+
+# Report files the test command writes into $RESULTS_DIR
+PYTEST_REPORT = "pytest.xml"
+JEST_REPORT = "jest.json"
+MESSAGE_CHARS = 300
+
+# unittest -v:   test_add (test_calc.TestCalc.test_add) ... ok      (3.11+; older versions print only the class)
+UNITTEST_VERBOSE_RE = re.compile(
+    r'^(?P<name>[\w.]+) \((?P<id>[\w.]+)\)(?:\n[^\n]*?)? \.\.\. (?P<status>ok|FAIL|ERROR|skipped\b.*|expected failure|unexpected success)$',
+    re.MULTILINE
+)
+UNITTEST_RAN_RE = re.compile(r'^Ran (?P<count>\d+) tests? in (?P<seconds>[\d.]+)s', re.MULTILINE)
+UNITTEST_OUTCOMES = {"ok": "passed", "FAIL": "failed", "ERROR": "error", "expected failure": "passed", "unexpected success": "failed"}
+
+
+class TestCase(TypedDict):
+    id: str             # pytest node ID, unittest dotted ID, or "file › full name" for Jest
+    file: str           # repo-relative test file ("" when the runner does not say)
+    outcome: str        # passed / failed / error / skipped / collection_error (a test module that could not be imported)
+    duration: float
+    message: str        # first line of the failure, "" for passing tests
+
+
+class TestReport(TypedDict):
+    """What one sandbox test run did, read from the runner's own report instead of its console output."""
+    runner: str         # pytest / unittest / jest
+    collected: int      # tests that were collected and ran (collection errors not included)
+    passed: int
+    failed: int
+    errors: int         # errors outside assertions
+    skipped: int
+    collection_errors: int  # test modules that could not even be imported
+    duration: float
+    selected: bool      # only chosen test IDs ran (the failing-test-first rerun), not the whole suite
+    failing: List[str]  # IDs of failed and errored tests, in run order (what the failing-test-first rerun needs); no collection errors
+    cases: List[TestCase]
+
+
+def _report(runner: str, cases: list, duration: float) -> TestReport:
+    counts = {
+        outcome: sum(1 for case in cases if case["outcome"] == outcome)
+        for outcome in ("passed", "failed", "error", "skipped", "collection_error")
+    }
+    return {
+        "runner": runner,
+        "collected": len(cases) - counts["collection_error"],
+        "passed": counts["passed"],
+        "failed": counts["failed"],
+        "errors": counts["error"],
+        "skipped": counts["skipped"],
+        "collection_errors": counts["collection_error"],
+        "duration": round(duration, 3),
+        "selected": False,
+        "failing": [case["id"] for case in cases if case["outcome"] in ("failed", "error")],
+        "cases": cases,
+    }
+
+
+def _first_line(text: str) -> str:
+    return (text or "").strip().split("\n")[0][:MESSAGE_CHARS]
+
+
+def parse_junit_xml(path: str) -> TestReport:
+    """pytest's --junitxml output (junit_family=xunit1, so every testcase names its file)."""
+    root = ET.parse(path).getroot()
+    suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+    cases, duration = [], 0.0
+    for suite in suites:
+        duration += float(suite.get("time") or 0)
+        for testcase in suite.iter("testcase"):
+            name, classname, file = testcase.get("name", ""), testcase.get("classname", ""), testcase.get("file", "")
+            outcome, message = "passed", ""
+            for tag, result in (("failure", "failed"), ("error", "error"), ("skipped", "skipped")):
+                child = testcase.find(tag)
+                if child is not None:
+                    outcome, message = result, _first_line(child.get("message") or child.text)
+                    break
+            if not classname:
+                # Collection error: pytest reports the module (tests.test_x) as the test name
+                outcome = "collection_error"
+                file = file or name.replace(".", "/") + ".py"
+                test_id = file
+            elif file:
+                module = os.path.splitext(file)[0].replace("/", ".").replace("\\", ".")
+                inner = classname[len(module) + 1:] if classname.startswith(module + ".") else ""
+                test_id = "::".join([file] + (inner.split(".") if inner else []) + [name])
+            else:
+                test_id = f"{classname}::{name}"
+            cases.append({"id": test_id, "file": file, "outcome": outcome,
+                          "duration": round(float(testcase.get("time") or 0), 3), "message": message})
+    return _report("pytest", cases, duration)
+
+
+def parse_jest_json(path: str, repo_path: str) -> TestReport:
+    """Jest's --json --outputFile report."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    cases = []
+    started = data.get("startTime") or 0
+    finished = started
+    for suite in data.get("testResults", []):
+        file = os.path.relpath(suite.get("name", ""), repo_path) if os.path.isabs(suite.get("name", "")) else suite.get("name", "")
+        finished = max(finished, suite.get("endTime") or 0)
+        assertions = suite.get("assertionResults", [])
+        if not assertions and suite.get("status") == "failed":
+            # The suite failed before any test ran (syntax error, missing module)
+            cases.append({"id": file, "file": file, "outcome": "collection_error", "duration": 0.0, "message": _first_line(suite.get("message"))})
+        for assertion in assertions:
+            status = assertion.get("status")
+            outcome = {"passed": "passed", "failed": "failed"}.get(status, "skipped")
+            cases.append({
+                "id": f"{file} › {assertion.get('fullName') or assertion.get('title', '')}",
+                "file": file,
+                "outcome": outcome,
+                "duration": round((assertion.get("duration") or 0) / 1000, 3),
+                "message": _first_line("\n".join(assertion.get("failureMessages") or [])),
+            })
+    return _report("jest", cases, max(finished - started, 0) / 1000)
+
+
+def parse_unittest_output(output: str):
+    """`python -m unittest -v` has no report file, so its verbose lines are the report. None if unittest did not run."""
+    ran = UNITTEST_RAN_RE.search(output or "")
+    if ran is None:
+        return None
+    cases = []
+    for match in UNITTEST_VERBOSE_RE.finditer(output):
+        name, test_id, status = match.group("name"), match.group("id"), match.group("status")
+        if not test_id.endswith("." + name):
+            test_id = f"{test_id}.{name}"  # before 3.11 the parentheses hold the class only
+        outcome = "skipped" if status.startswith("skipped") else UNITTEST_OUTCOMES[status]
+        if test_id.startswith("unittest.loader._FailedTest."):
+            outcome = "collection_error"
+        cases.append({"id": test_id, "file": "", "outcome": outcome, "duration": 0.0, "message": ""})
+    return _report("unittest", cases, float(ran.group("seconds")))
+
+
+def read_report(results_dir: str, repo_path: str, output: str):
+    """The report the run left in `results_dir` (or printed, for unittest), or None when the runner gives none (e.g. plain `node test.js`)."""
+    jest_path = os.path.join(results_dir, JEST_REPORT)
+    pytest_path = os.path.join(results_dir, PYTEST_REPORT)
+    try:
+        if os.path.isfile(jest_path):
+            return parse_jest_json(jest_path, repo_path)
+        pytest_report = parse_junit_xml(pytest_path) if os.path.isfile(pytest_path) else None
+    except (ET.ParseError, ValueError, OSError) as e:
+        print(f"⚠️ TEST REPORT: Could not read the runner's report ({str(e)})")
+        return None
+    if pytest_report and (pytest_report["collected"] or pytest_report["collection_errors"]):
+        return pytest_report
+    # pytest collected nothing (or is missing), so the unittest fallback ran
+    return parse_unittest_output(output) or pytest_report
+
+
+def compact_report(report):
+    """The report without its passing cases (the counts stay): what goes into the graph state and checkpoints."""
+    if not report:
+        return None
+    return {**report, "cases": [case for case in report["cases"] if case["outcome"] != "passed"]}
+
+
+def report_summary(report) -> dict:
+    """Counts and the first failing IDs, for the UI."""
+    return {
+        key: report[key]
+        for key in ("runner", "collected", "passed", "failed", "errors", "skipped", "collection_errors", "duration", "selected")
+    } | {"failing": report["failing"][:20]}
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+
+from concurrency import MAX_CONCURRENT_RUNS
+from event_log import RunEventLog
+
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", "100"))
+RUN_TTL_SECONDS = int(os.getenv("RUN_TTL_SECONDS", "3600"))      # how long finished runs stay streamable
+EVENT_BUFFER_SIZE = int(os.getenv("RUN_EVENT_BUFFER_SIZE", "1000"))
+DEFAULT_RUN_SECONDS = 180.0                                          # ETA guess before we have history
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler is saturated and cannot accept more runs."""
+
+
+class Run:
+    """One submitted agent run and its event log (shared by every viewer of the run)."""
+
+    def __init__(self, run_id: str, request, priority: int = 0):
+        self.run_id = run_id
+        self.request = request
+        self.team = request.teamName.strip().upper()
+        self.priority = priority
+        self.status = "QUEUED"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        # Bounded ring: the run executes once and any number of streams replay/follow it.
+        self.events = RunEventLog(EVENT_BUFFER_SIZE)
+        self.done = asyncio.Event()
+        self._last_queue_position = None
+
+    def publish(self, event: dict):
+        self.events.append(event)
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "team": self.team,
+            "priority": self.priority,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class RunScheduler:
+    """
+    Starts runs as soon as they are submitted, up to MAX_CONCURRENT_RUNS at once.
+    Overflow waits in a queue ordered by priority, then by how many runs the team
+    already has in flight and how recently it was served (fairness), then by submission time.
+    """
+
+    def __init__(self, runner, max_concurrent: int = MAX_CONCURRENT_RUNS,
+                 max_queued: int = MAX_QUEUED_RUNS, ttl: int = RUN_TTL_SECONDS, on_finish=None):
+        self.runner = runner                 # async generator factory: runner(run_id, request)
+        self.on_finish = on_finish           # called with the Run once it stops, whatever its status
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.runs = {}
+        self._queue = []
+        self._running = {}                   # run_id -> Run
+        self._last_served = {}               # team -> time its last run started
+        self._recent_durations = deque(maxlen=50)
+        self._sweeper = None
+        self._stopping = False               # set by stop(): nothing new starts once shutdown has begun
+
+    # --- 🚦 Submission & ordering ---
+
+    def submit(self, run_id: str, request, priority: int = 0) -> Run:
+        if len(self._queue) >= self.max_queued:
+            raise QueueFullError(f"{len(self._queue)} runs already queued")
+        run = Run(run_id, request, priority)
+        self.runs[run_id] = run
+        self._queue.append(run)
+        self._dispatch()
+        self._publish_queue_positions()
+        return run
+
+    def _team_load(self, team: str) -> int:
+        return sum(1 for run in self._running.values() if run.team == team)
+
+    def _ordered_queue(self) -> list:
+        return sorted(self._queue, key=lambda run: (
+            -run.priority,
+            self._team_load(run.team),
+            self._last_served.get(run.team, 0.0),
+            run.submitted_at
+        ))
+
+    def _dispatch(self):
+        if self._stopping:
+            return
+        while self._queue and len(self._running) < self.max_concurrent:
+            run = self._ordered_queue()[0]
+            self._queue.remove(run)
+            self._running[run.run_id] = run
+            run.status = "RUNNING"
+            run.started_at = time.time()
+            self._last_served[run.team] = run.started_at
+            run.task = asyncio.create_task(self._execute(run))
+
+    async def _execute(self, run: Run):
+        try:
+            async for event in self.runner(run.run_id, run.request):
+                run.publish(event)
+            run.status = "FINISHED"
+        except asyncio.CancelledError:
+            run.status = "CANCELLED"
+            raise
+        except Exception as e:
+            print(f"❌ SCHEDULER: Run {run.run_id} crashed: {str(e)}")
+            run.publish({"event": "log", "data": f"❌ Internal error: {str(e)}"})
+            run.publish({"event": "status", "data": "FAILED"})
+            run.status = "FAILED"
+        finally:
+            run.finished_at = time.time()
+            self._recent_durations.append(run.finished_at - run.started_at)
+            self._running.pop(run.run_id, None)
+            run.events.close()
+            run.done.set()
+            if self.on_finish:
+                self.on_finish(run)
+            self._dispatch()
+            self._publish_queue_positions()
+
+    # --- 📊 Visibility ---
+
+    def _publish_queue_positions(self):
+        """Pushes a `queue` event to every waiting run whose position changed."""
+        for run in self._queue:
+            position = self.queue_position(run.run_id)
+            if position != run._last_queue_position:
+                run._last_queue_position = position
+                run.publish({"event": "queue", "data": json.dumps({
+                    "position": position,
+                    "eta_seconds": self.eta_seconds(run.run_id)
+                })})
+
+    def queue_position(self, run_id: str):
+        """1-based position among queued runs, or None if the run is not waiting."""
+        for index, run in enumerate(self._ordered_queue()):
+            if run.run_id == run_id:
+                return index + 1
+        return None
+
+    def eta_seconds(self, run_id: str):
+        """Rough wait until the run starts: full 'waves' of running slots ahead of it times the average run time."""
+        position = self.queue_position(run_id)
+        if position is None:
+            return 0
+        average = (sum(self._recent_durations) / len(self._recent_durations)) if self._recent_durations else DEFAULT_RUN_SECONDS
+        return round(math.ceil(position / self.max_concurrent) * average)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "tracked_runs": len(self.runs),
+            "max_concurrent_runs": self.max_concurrent,
+            "max_queued_runs": self.max_queued,
+        }
+
+    # --- 🧹 Lifecycle ---
+
+    async def _sweep_forever(self, interval: int = 60):
+        while True:
+            await asyncio.sleep(interval)
+            self.expire_finished()
+
+    def expire_finished(self):
+        cutoff = time.time() - self.ttl
+        expired = [run_id for run_id, run in self.runs.items() if run.finished_at and run.finished_at < cutoff]
+        for run_id in expired:
+            del self.runs[run_id]
+        if expired:
+            print(f"🧹 SCHEDULER: Expired {len(expired)} finished run(s)")
+
+    def start(self):
+        self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        # Runs cancelled below would otherwise hand their slots to queued runs, which then get cancelled too
+        self._stopping = True
+        tasks = [run.task for run in self._running.values() if run.task]
+        if self._sweeper:
+            tasks.append(self._sweeper)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
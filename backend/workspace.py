@@ -0,0 +1,223 @@
+import errno
+import fcntl
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+# Not copied into views: tests never need git history, and it is by far the biggest directory.
+SKIPPED_DIRS = {".git"}
+# ioctl that makes `dst` share `src`'s data blocks copy-on-write (btrfs, XFS, overlayfs on either...)
+FICLONE = 0x40049409
+
+
+def write_file_atomic(path: str, content: str):
+    """Writes via a temp file + rename, so a crash never leaves a half-written file behind."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".healing-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_reflink_supported = True
+
+
+def _clone_or_copy(src: str, dst: str):
+    """
+    A private copy of `src`: a reflink where the filesystem supports it (instant, no extra space), a plain copy otherwise.
+    Never a hardlink: tests that rewrite a repo file in place would write through to the base checkout.
+    """
+    global _reflink_supported
+    if _reflink_supported:
+        try:
+            with open(src, "rb") as source, open(dst, "wb") as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS):
+                raise
+            if e.errno != errno.EXDEV:
+                _reflink_supported = False  # same filesystem for every view: stop trying
+    shutil.copy2(src, dst)
+
+
+def _same_entry(src: str, dst: str) -> bool:
+    """Whether `dst` still mirrors `src`: the same link target, or a regular file with the same size and mtime (copies keep it)."""
+    try:
+        if os.path.islink(src) or os.path.islink(dst):
+            return os.path.islink(src) and os.path.islink(dst) and os.readlink(src) == os.readlink(dst)
+        a, b = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns
+
+
+def _remove(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def _sync_tree(base: str, view_path: str):
+    """
+    Makes `view_path` a copy of `base` (minus SKIPPED_DIRS). Only what differs is copied, so an empty view costs
+    a full copy and a used one costs a stat per file plus the files its run touched.
+    """
+    # 1. Whatever the run created (caches, reports, new files) goes
+    for root, dirs, files in os.walk(view_path):
+        base_root = os.path.join(base, os.path.relpath(root, view_path))
+        for name in list(dirs):
+            entry, base_entry = os.path.join(root, name), os.path.join(base_root, name)
+            if os.path.islink(entry):
+                if not os.path.lexists(base_entry):
+                    _remove(entry)
+            elif name in SKIPPED_DIRS or os.path.islink(base_entry) or not os.path.isdir(base_entry):
+                _remove(entry)
+                dirs.remove(name)
+        for name in files:
+            base_entry = os.path.join(base_root, name)
+            if not os.path.lexists(base_entry) or (os.path.isdir(base_entry) and not os.path.islink(base_entry)):
+                _remove(os.path.join(root, name))
+    # 2. Everything the base has and the view lacks or changed is copied again
+    for root, dirs, files in os.walk(base):
+        dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+        target_root = os.path.normpath(os.path.join(view_path, os.path.relpath(root, base)))
+        os.makedirs(target_root, exist_ok=True)
+        # Symlinked directories are not walked into: they are copied as links, like files
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+            src = os.path.join(root, name)
+            dst = os.path.join(target_root, name)
+            if _same_entry(src, dst):
+                continue
+            _remove(dst)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                _clone_or_copy(src, dst)
+
+
+class WorkspaceView:
+    """A private copy of the base checkout (copy-on-write where possible). Nothing done in it reaches the base until promote()."""
+
+    def __init__(self, base: str, path: str):
+        self.base = base
+        self.path = path
+        self.changed = set()
+
+    def write_file(self, relative_path: str, content: str):
+        write_file_atomic(os.path.join(self.path, relative_path), content)
+        self.changed.add(relative_path)
+
+    def restore(self):
+        """
+        Puts the view back to the base state, whatever the fix or its tests did to it (and picks up what was promoted
+        since). Costs a stat per file plus a copy of each file that differs, not a copy of the repo.
+        """
+        _sync_tree(self.base, self.path)
+        self.changed.clear()
+
+    def promote(self, paths: list = None):
+        """Copies this view's changes (or only `paths` among them) into the base checkout (e.g. after its tests passed)."""
+        for relative_path in self.changed if paths is None else self.changed.intersection(paths):
+            with open(os.path.join(self.path, relative_path), "r", encoding="utf-8") as f:
+                write_file_atomic(os.path.join(self.base, relative_path), f.read())
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class WorkspaceManager:
+    """
+    Keeps one base checkout per run and hands out views of it. Views are reused: a released one is restored
+    and kept for the next attempt, so a run only pays a full copy per view it needs at once (one, or one per
+    speculative candidate).
+    """
+
+    def __init__(self, base: str):
+        self.base = os.path.abspath(base)
+        self.views_root = f"{self.base}.views"
+        self._views = {}
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def create_view(self) -> WorkspaceView:
+        view_path = os.path.join(self.views_root, uuid.uuid4().hex[:12])
+        _sync_tree(self.base, view_path)
+        view = WorkspaceView(self.base, view_path)
+        with self._lock:
+            self._views[view_path] = view
+        return view
+
+    def acquire(self) -> WorkspaceView:
+        """An idle view brought up to date with the base, or a new one."""
+        with self._lock:
+            view = self._idle.pop() if self._idle else None
+        if view is None:
+            return self.create_view()
+        try:
+            view.restore()
+        except Exception:
+            self.discard(view)
+            raise
+        return view
+
+    def release(self, view: WorkspaceView):
+        """Returns a view for reuse; it is restored when next acquired, so releasing costs nothing."""
+        with self._lock:
+            if view.path in self._views:
+                self._idle.append(view)
+
+    def discard(self, view: WorkspaceView):
+        view.close()
+        with self._lock:
+            self._views.pop(view.path, None)
+
+    @contextmanager
+    def view(self):
+        """`with manager.view() as v:` — the view goes back to the manager on exit, pass or fail."""
+        view = self.acquire()
+        try:
+            yield view
+        finally:
+            self.release(view)
+
+    def cleanup(self):
+        with self._lock:
+            views, self._views, self._idle = list(self._views.values()), {}, []
+        for view in views:
+            view.close()
+        shutil.rmtree(self.views_root, ignore_errors=True)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_workspace_manager(repo_path: str) -> WorkspaceManager:
+    """One manager per base checkout, shared by every node of the run."""
+    key = os.path.abspath(repo_path)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = WorkspaceManager(key)
+        return _managers[key]
+
+
+def release_workspaces(repo_path: str):
+    """Deletes every view of a run's checkout (called when the run ends)."""
+    with _managers_lock:
+        manager = _managers.pop(os.path.abspath(repo_path), None)
+    if manager:
+        manager.cleanup()
@@ -56,11 +56,39 @@ function App() {
         setCurrentStep(parseInt(e.data));
       });
 
+      // Listen for queue position while the run waits for a free slot
+      eventSource.addEventListener('queue', (e) => {
+        const queue = JSON.parse(e.data);
+        console.log(`⏳ QUEUED: position ${queue.position}, ~${queue.eta_seconds}s`);
+      });
+
       // Listen for text logs (we will just print these to the browser console for now)
       eventSource.addEventListener('log', (e) => {
         console.log("🤖 AGENT LOG:", e.data);
       });
 
+      // Full sandbox output (the AI only sees a compacted version of it)
+      eventSource.addEventListener('raw_log', (e) => {
+        const rawLog = JSON.parse(e.data);
+        console.log("📜 FULL SANDBOX LOG:", `http://127.0.0.1:8000${rawLog.url}`);
+      });
+
+      // Per-test results of each sandbox run, from the test runner's own report
+      eventSource.addEventListener('tests', (e) => {
+        const tests = JSON.parse(e.data);
+        console.log(`🧪 TESTS (${tests.runner}): ${tests.passed}/${tests.collected} passed, ${tests.failed} failed, ${tests.errors} errors in ${tests.duration}s`, tests.failing);
+      });
+
+      // The fix (or QA suite) while the model is still writing it
+      eventSource.addEventListener('patch_progress', (e) => {
+        const progress = JSON.parse(e.data);
+        if (progress.phase === 'cancelled') {
+          console.warn(`✂️ ${progress.minister} answer cut short: ${progress.reason}`);
+        } else {
+          console.log(`✍️ ${progress.minister} [${progress.phase}] ${progress.chars} chars`, progress.commit || '');
+        }
+      });
+
       // Listen for applied fixes to populate the table
       eventSource.addEventListener('fix', (e) => {
         const newFix = JSON.parse(e.data);
@@ -73,11 +101,15 @@ function App() {
         setScore(newScore);
       });
 
-      // Handle connection errors
+      // Handle connection errors. The browser reconnects on its own with Last-Event-ID,
+      // and the backend replays what we missed, so only a closed stream is fatal.
       eventSource.onerror = (err) => {
-        console.error("SSE Stream Error:", err);
-        setStatus('FAILED');
-        eventSource.close();
+        if (eventSource.readyState === EventSource.CLOSED) {
+          console.error("SSE Stream Error:", err);
+          setStatus('FAILED');
+          return;
+        }
+        console.warn("SSE connection lost, reconnecting...");
       };
 
     } catch (error) {